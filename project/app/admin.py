@@ -1,4 +1,7 @@
-from django.contrib import admin
+from functools import partial
+
+from django.contrib import admin, messages
+from django.db import transaction
 from django.contrib.admin.templatetags.admin_urls import add_preserved_filters
 from django.http import HttpResponseRedirect
 from django.urls import reverse, path
@@ -14,6 +17,7 @@ from polymorphic.admin import (
     PolymorphicChildModelFilter,
 )
 
+from . import deletion, leaderboard
 from .models import (
     Player,
     Guest,
@@ -26,6 +30,7 @@ from .models import (
     Play,
     Genre,
     StatGame,
+    GameStatistics,
     Entry,
 )
 
@@ -141,7 +146,10 @@ class PlayerChildAdmin(PolymorphicChildModelAdmin):
 
     @admin.action(description=gettext("Reset scores"))
     def reset_scores(self, request, queryset):
+        player_ids = list(queryset.values_list("pk", flat=True))
         rows_updated = queryset.update(score=0)
+        # update() sends no signal
+        transaction.on_commit(partial(leaderboard.update_player_scores, dict.fromkeys(player_ids, 0)))
         self.action_message(request, rows_updated)
 
     actions = [reset_scores]
@@ -257,7 +265,10 @@ class PlayerParentAdmin(PolymorphicParentModelAdmin):
 
     @admin.action(description=gettext("Reset scores"))
     def reset_scores(self, request, queryset):
+        player_ids = list(queryset.values_list("pk", flat=True))
         rows_updated = queryset.update(score=0)
+        # update() sends no signal
+        transaction.on_commit(partial(leaderboard.update_player_scores, dict.fromkeys(player_ids, 0)))
         self.action_message(request, rows_updated)
 
     actions = [reset_scores]
@@ -304,6 +315,7 @@ class GameAdmin(admin.ModelAdmin):
         "level",
         "link",
         "play",
+        "deletion_progress",
     )
     list_display_links = (
         "link",
@@ -354,6 +366,36 @@ class GameAdmin(admin.ModelAdmin):
         url = reverse("admin:game_play", args=[obj.pk])
         return format_html(f'<a href="{url}">📝</a>')
 
+    @admin.display(description=gettext("deletion"))
+    def deletion_progress(self, obj):
+        if obj.deletion_requested_at is None:
+            return ""
+        progress = deletion.get_progress(obj.pk)
+        if progress is None:
+            return gettext("Pending")
+        return f"{min(100, 100 * progress['deleted'] // progress['total'])} %"
+
+    def get_deleted_objects(self, objs, request):
+        # The children are deleted in the background: do not collect them to display the confirmation page
+        deleted_objects = [str(obj) for obj in objs]
+        perms_needed = set() if self.has_delete_permission(request) else {self.opts.verbose_name}
+        return deleted_objects, {self.opts.verbose_name_plural: len(deleted_objects)}, perms_needed, []
+
+    def delete_model(self, request, obj):
+        deletion.request_deletion(Game.objects.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        deletion.request_deletion(queryset)
+
+    @admin.action(description=gettext("Clone selected games"))
+    def clone_games(self, request, queryset):
+        game_ids = list(queryset.values_list("pk", flat=True))
+        for game_id in game_ids:
+            Game.objects.clone(game_id)
+        self.message_user(request, gettext("{} games cloned").format(len(game_ids)))
+
+    actions = [clone_games]
+
 class AnswerInline(admin.TabularInline):
     model = Answer
     fields = ("text", "points", "order")
@@ -477,14 +519,52 @@ class StatGameAdmin(admin.ModelAdmin):
     )
     list_display_links = None
 
-    @admin.display(description=gettext("Number of questions"))
-    def nb_questions(self, obj):
-        # return obj.question_set.count()
-        return obj.nb_questions
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(GameStatistics)
+class GameStatisticsAdmin(admin.ModelAdmin):
+    search_fields = (
+        "game__name",
+    )
+    list_display = (
+        "game",
+        "nb_questions",
+        "nb_players",
+        "average_score",
+        "completion_rate",
+        "last_played_at",
+    )
+    list_select_related = (
+        "game",
+    )
+    ordering = (
+        "game__name",
+    )
+    list_display_links = None
+
+    def get_urls(self):
+        return [
+            path(
+                "refresh/",
+                self.admin_site.admin_view(self.refresh_view),
+                name="app_gamestatistics_refresh",
+            ),
+            *super().get_urls(),
+        ]
 
-    @admin.display(description=gettext("Number of players"))
-    def nb_players(self, obj):
-        return obj.nb_players
+    def refresh_view(self, request):
+        if request.method == "POST" and self.has_view_permission(request):
+            GameStatistics.objects.refresh()
+            self.message_user(request, gettext("The games statistics are refreshed."), messages.SUCCESS)
+        return HttpResponseRedirect(reverse("admin:app_gamestatistics_changelist"))
 
     def has_change_permission(self, request, obj=None):
         return False
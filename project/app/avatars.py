@@ -0,0 +1,124 @@
+"""Avatar rendering, with the fonts and the colour palette shared by every avatar of a worker process.
+
+Avatars only depend on the initials, the background colour and the size: they are stored once under a name
+derived from these, and every player with the same avatar shares the same file.
+
+Players waiting for an avatar are collected in a Redis set, so that a burst of saves is rendered by a single
+task instead of one task per save.
+"""
+
+import hashlib
+from functools import cache
+from io import BytesIO
+from itertools import product
+from random import choice
+
+from django.core.cache import cache as django_cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django_redis import get_redis_connection
+from PIL import Image, ImageColor, ImageDraw, ImageFont
+
+
+__all__ = [
+    "get_initials",
+    "render_avatar",
+    "avatar_key",
+    "avatar_path",
+    "store_avatar",
+    "mark_avatar_pending",
+    "pop_pending_avatars",
+    "clear_avatar_schedule",
+]
+
+
+AVATAR_DIRECTORY = "app/avatar"
+AVATAR_SIZE = 128
+FONT_SIZE = 64
+
+# Dark background colours, the initials being written in white
+PALETTE = tuple("#" + "".join(digits) for digits in product("01234567", repeat=3))
+
+PENDING_KEY = "avatars:pending"
+SCHEDULED_KEY = "avatars:scheduled"
+# Time given to the saves of a burst to join the same batch
+AVATAR_BATCH_DELAY = 2
+AVATAR_BATCH_SIZE = 500
+
+
+@cache
+def get_font(size: int = FONT_SIZE):
+    return ImageFont.load_default(size=size)
+
+
+def get_initials(user) -> str:
+    match user.first_name, user.last_name, user.username:
+        case first_name, last_name, _ if first_name and last_name:
+            return first_name[0] + last_name[0]
+        case first_name, "" | None, _ if first_name:
+            return first_name[:2]
+        case "" | None, last_name, _ if last_name:
+            return last_name[:2]
+        case _:
+            return user.username[:2]
+
+
+def render_avatar(initials: str, color: str, size: int = AVATAR_SIZE) -> bytes:
+    """Return the PNG content of an avatar showing the initials on a dark background."""
+
+    img = Image.new("RGB", (size, size), color=color)
+    draw = ImageDraw.Draw(img)
+    font = get_font()
+
+    # Get the text position (up left corner)
+    bounding_box = font.getbbox(initials)
+    text_width = bounding_box[2] - bounding_box[0]
+    text_height = bounding_box[3] - bounding_box[1]
+    position = ((size - text_width) / 2, (size - text_height) / 2)
+
+    draw.text(position, initials, fill="white", font=font)
+
+    with BytesIO() as image_io:
+        img.save(image_io, format="PNG")
+        return image_io.getvalue()
+
+
+def avatar_key(initials: str, color: str | tuple[int, int, int], size: int = AVATAR_SIZE) -> str:
+    # "#123" and "#112233" are the same colour
+    red, green, blue = ImageColor.getrgb(color)[:3] if isinstance(color, str) else color[:3]
+    return hashlib.sha256(f"{initials}|{red},{green},{blue}|{size}".encode()).hexdigest()
+
+
+def avatar_path(key: str) -> str:
+    return f"{AVATAR_DIRECTORY}/{key[:2]}/{key}.png"
+
+
+def store_avatar(initials: str, color: str | None = None, size: int = AVATAR_SIZE) -> str:
+    """Return the storage name of the avatar, rendering and writing it only if nobody has it yet."""
+
+    name = avatar_path(avatar_key(initials, color := color or choice(PALETTE), size))
+    if not default_storage.exists(name):
+        stored_name = default_storage.save(name, ContentFile(render_avatar(initials, color, size)))
+        if stored_name != name:
+            # Written by someone else in the meantime, under the same content
+            default_storage.delete(stored_name)
+    return name
+
+
+def mark_avatar_pending(player_pk: int) -> bool:
+    """Add a player to the pending set and return whether a batch has to be scheduled for it."""
+
+    redis = get_redis_connection("default")
+    redis.sadd(django_cache.make_key(PENDING_KEY), player_pk)
+    return django_cache.add(SCHEDULED_KEY, 1, timeout=AVATAR_BATCH_DELAY * 10)
+
+
+def clear_avatar_schedule() -> None:
+    """Called by the batch before reading the pending set: later saves schedule a new batch."""
+
+    django_cache.delete(SCHEDULED_KEY)
+
+
+def pop_pending_avatars(count: int = AVATAR_BATCH_SIZE) -> list[int]:
+    redis = get_redis_connection("default")
+    return [int(pk) for pk in redis.spop(django_cache.make_key(PENDING_KEY), count)]
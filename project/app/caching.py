@@ -0,0 +1,189 @@
+"""Cache dependency registry with per-model versioned keys.
+
+Cached pages and fragments declare the models they depend on. Saving or deleting an instance of one of
+those models bumps its version key, which changes the key prefix of every dependent cache entry: stale
+entries are never read again and expire on their own, instead of flushing the whole cache.
+"""
+
+import time
+from functools import wraps
+
+from django.core.cache import cache
+from django.db import models
+from django.views.decorators.cache import cache_page
+
+from .utils import delete_cache_by_prefix
+
+
+__all__ = [
+    "register_dependencies",
+    "get_dependencies",
+    "bump_model_versions",
+    "versioned_key_prefix",
+    "aversioned_key_prefix",
+    "aget_or_compute",
+    "cache_page_depending_on",
+    "purge_key_prefix",
+    "store_fresh_value",
+    "get_stale_while_revalidate",
+]
+
+
+VERSION_KEY_PREFIX = "cache_version"
+
+# Cache key prefix -> labels of the models it depends on
+_dependencies: dict[str, set[str]] = {}
+
+
+def _label(model: type[models.Model]) -> str:
+    return model._meta.label_lower  # pylint: disable=protected-access
+
+
+def _version_key(label: str) -> str:
+    return f"{VERSION_KEY_PREFIX}:{label}"
+
+
+def register_dependencies(key_prefix: str, *dependencies: type[models.Model]) -> None:
+    """Declare that the entries cached under key_prefix depend on the given models."""
+
+    _dependencies.setdefault(key_prefix, set()).update(_label(model) for model in dependencies)
+
+
+def get_dependencies(key_prefix: str) -> set[str]:
+    return _dependencies.get(key_prefix, set())
+
+
+def _initial_version() -> int:
+    # An evicted version key must never come back to a value that was already used
+    return time.time_ns()
+
+
+def _labels_with_parents(model: type[models.Model]) -> set[str]:
+    """A subclass instance (multi-table inheritance) is also an instance of its parents."""
+
+    return {_label(model), *(_label(parent) for parent in model._meta.get_parent_list())}  # pylint: disable=protected-access
+
+
+def bump_model_versions(*changed_models: type[models.Model]) -> None:
+    """Invalidate every cache entry depending on one of the given models."""
+
+    labels = set().union(*(_labels_with_parents(model) for model in changed_models))
+    for label in labels:
+        try:
+            cache.incr(_version_key(label))
+        except ValueError:
+            cache.set(_version_key(label), _initial_version(), timeout=None)
+
+
+def _get_versions(labels: list[str]) -> list[int]:
+    keys = [_version_key(label) for label in labels]
+    versions = cache.get_many(keys)
+    missing = {key: _initial_version() for key in keys if key not in versions}
+    if missing:
+        for key, version in missing.items():
+            if not cache.add(key, version, timeout=None):
+                missing[key] = cache.get(key, version)
+        versions |= missing
+    return [versions[key] for key in keys]
+
+
+def versioned_key_prefix(key_prefix: str) -> str:
+    """Return the key prefix completed with the current versions of its dependencies."""
+
+    labels = sorted(get_dependencies(key_prefix))
+    if not labels:
+        return key_prefix
+    return key_prefix + "." + ".".join(str(version) for version in _get_versions(labels))
+
+
+async def _aget_versions(labels: list[str]) -> list[int]:
+    keys = [_version_key(label) for label in labels]
+    versions = await cache.aget_many(keys)
+    missing = {key: _initial_version() for key in keys if key not in versions}
+    if missing:
+        for key, version in missing.items():
+            if not await cache.aadd(key, version, timeout=None):
+                missing[key] = await cache.aget(key, version)
+        versions |= missing
+    return [versions[key] for key in keys]
+
+
+async def aversioned_key_prefix(key_prefix: str) -> str:
+    """Async version of versioned_key_prefix."""
+
+    labels = sorted(get_dependencies(key_prefix))
+    if not labels:
+        return key_prefix
+    return key_prefix + "." + ".".join(str(version) for version in await _aget_versions(labels))
+
+
+async def aget_or_compute(key_prefix: str, key: str, compute, timeout: int):
+    """Return the value cached under the versioned key prefix, awaiting compute() to store it when missing.
+
+    None is never cached.
+    """
+
+    cache_key = f"{await aversioned_key_prefix(key_prefix)}:{key}"
+    value = await cache.aget(cache_key)
+    if value is None:
+        value = await compute()
+        if value is not None:
+            await cache.aset(cache_key, value, timeout)
+    return value
+
+
+def cache_page_depending_on(timeout: int, *, key_prefix: str, dependencies: tuple[type[models.Model], ...]):
+    """Same as cache_page, invalidated as soon as one of the dependencies is saved or deleted."""
+
+    register_dependencies(key_prefix, *dependencies)
+
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            cached_view = cache_page(timeout, key_prefix=versioned_key_prefix(key_prefix))(view_func)
+            return cached_view(request, *args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+def purge_key_prefix(key_prefix: str) -> None:
+    """Eagerly delete every page cached under key_prefix, whatever the versions of its dependencies.
+
+    Not needed for correctness (outdated versions are never read again), only to reclaim memory at once.
+    """
+
+    for kind in ("cache_page", "cache_header"):
+        delete_cache_by_prefix(cache.make_key(f"views.decorators.cache.{kind}.{key_prefix}"))
+
+
+def store_fresh_value(key: str, value, fresh_for: int):
+    """Store a value considered fresh for fresh_for seconds, then served stale until it is refreshed."""
+
+    cache.set(key, {"value": value, "fresh_until": time.time() + fresh_for}, timeout=None)
+    return value
+
+
+def get_stale_while_revalidate(key: str, compute, *, fresh_for: int, lock_timeout: int = 30):
+    """Return the cached value, recomputing it in a single process at a time when it is outdated.
+
+    While the process holding the lock recomputes the value, every other one keeps serving the stale value
+    instead of hitting the database at the same time.
+    """
+
+    entry = cache.get(key)
+    if entry is not None and entry["fresh_until"] > time.time():
+        return entry["value"]
+
+    lock_key = f"{key}:lock"
+    if cache.add(lock_key, 1, timeout=lock_timeout):
+        try:
+            return store_fresh_value(key, compute(), fresh_for)
+        finally:
+            cache.delete(lock_key)
+
+    if entry is not None:
+        return entry["value"]
+
+    # Cold cache and someone else is already computing: do not store, do not wait
+    return compute()
@@ -0,0 +1,133 @@
+"""Creation of many games with their questions and answers, validated and inserted by sets.
+
+Whatever the number of games, questions and answers, a batch costs a fixed number of statements: no signal is
+sent, so no placeholder question is created.
+"""
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+
+from . import events
+from .models import Answer, Game, Question
+
+
+__all__ = [
+    "create_games",
+]
+
+
+CREATED = 201
+CONFLICT = 409
+INVALID = 422
+
+
+def _errors(instance, exclude, prefix="") -> list[str]:
+    # Uniqueness is checked by sets, in create_games
+    try:
+        instance.full_clean(exclude=exclude, validate_unique=False, validate_constraints=False)
+    except ValidationError as exc:
+        return [f"{prefix}{field}: {message}" for field, messages in exc.message_dict.items() for message in messages]
+    return []
+
+
+def _duplicates(values) -> set:
+    seen = set()
+    duplicates = set()
+    for value in values:
+        if value in seen:
+            duplicates.add(value)
+        seen.add(value)
+    return duplicates
+
+
+def _build(item: dict) -> tuple[Game, list[tuple[Question, list[Answer]]], list[str]]:
+    game = Game(
+        name=item["name"],
+        duration=item.get("duration"),
+        status=item["status"],
+        level=item.get("level"),
+    )
+    # Neither the slug, generated, nor the genre, not part of GameSchema: left empty, as its column allows
+    errors = _errors(game, exclude=["slug", "description", "genre"])
+
+    tree = []
+    for question_index, question_item in enumerate(item.get("question_set", [])):
+        question = Question(text=question_item["text"], points=question_item["points"], order=question_item["order"])
+        prefix = f"question_set[{question_index}]."
+        errors += _errors(question, exclude=["game"], prefix=prefix)
+        answers = []
+        for answer_index, answer_item in enumerate(question_item.get("answer_set", [])):
+            answer = Answer(text=answer_item["text"], points=answer_item["points"], order=answer_item["order"])
+            errors += _errors(answer, exclude=["question"], prefix=f"{prefix}answer_set[{answer_index}].")
+            answers.append(answer)
+        errors += [
+            f"{prefix}answer_set: duplicate text {text!r}" for text in _duplicates(answer.text for answer in answers)
+        ]
+        tree.append((question, answers))
+
+    errors += [
+        f"question_set: duplicate text {text!r}" for text in _duplicates(question.text for question, _ in tree)
+    ]
+    return game, tree, errors
+
+
+def create_games(items: list[dict]) -> list[dict]:
+    """Create the valid games of the items, with their questions and answers, in one transaction.
+
+    Return one result per item, in the same order: its name, its status (201, 409 or 422), the id of the created
+    game and the validation errors.
+    """
+
+    built = [_build(item) for item in items]
+    results = [{"name": game.name, "status": CREATED, "id": None, "errors": errors} for game, _, errors in built]
+
+    existing_names = set(
+        Game.objects.filter(name__in=[game.name for game, _, _ in built]).values_list("name", flat=True)
+    )
+    batch_names = set()
+    for result, (game, _, _) in zip(results, built):
+        if game.name in existing_names or game.name in batch_names:
+            result["errors"].append("name: a game with this name already exists")
+        batch_names.add(game.name)
+        if result["errors"]:
+            result["status"] = INVALID
+
+    valid = [(result, game, tree) for result, (game, tree, _) in zip(results, built) if result["status"] == CREATED]
+    if not valid:
+        return results
+
+    try:
+        with transaction.atomic():
+            games = [game for _, game, _ in valid]
+            for game, slug in zip(games, Game.generate_slugs([game.name for game in games])):
+                game.slug = slug
+            Game.objects.bulk_create(games)
+
+            questions = []
+            answers = []
+            for _, game, tree in valid:
+                for question, question_answers in tree:
+                    question.game = game
+                    # Questions are worth at least as much as their best answer
+                    question.points = max([question.points, *(answer.points for answer in question_answers)])
+                    questions.append(question)
+            Question.objects.bulk_create(questions)
+            for _, _, tree in valid:
+                for question, question_answers in tree:
+                    for answer in question_answers:
+                        answer.question = question
+                        answers.append(answer)
+            Answer.objects.bulk_create(answers)
+
+            # Not "game.created": the questions are created with the games
+            events.emit_many("game.updated", games)
+    except IntegrityError:
+        # A game of the same name was created meanwhile
+        for result, _, _ in valid:
+            result["status"] = CONFLICT
+            result["errors"].append("name: a game with this name was created meanwhile, please retry")
+        return results
+
+    for result, game, _ in valid:
+        result["id"] = game.pk
+    return results
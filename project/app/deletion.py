@@ -0,0 +1,116 @@
+"""Background deletion of games, by bounded batches.
+
+A game whose deletion is requested is hidden at once (see GameQuerySet.visible), then its entries, plays, answers
+and questions are deleted by a Celery task, one short transaction per batch, and the game itself last.
+"""
+
+from functools import partial
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.timezone import now
+
+from . import events
+from .models import Answer, Entry, Game, Play, Question
+from .scoring import discard_plays
+
+
+__all__ = [
+    "request_deletion",
+    "delete_game",
+    "get_progress",
+]
+
+
+BATCH_SIZE = 1000
+
+PROGRESS_KEY = "game_deletion:{}"
+PROGRESS_TIMEOUT = 24 * 60 * 60
+
+
+def request_deletion(games) -> int:
+    """Hide the games of the queryset at once, delete them in the background and return their number."""
+
+    from .tasks import delete_game as delete_game_task  # pylint: disable=import-outside-toplevel
+
+    game_ids = list(games.filter(deletion_requested_at__isnull=True).values_list("pk", flat=True))
+    if not game_ids:
+        return 0
+
+    Game.objects.filter(pk__in=game_ids).update(deletion_requested_at=now())
+    # update() sends no signal: the game lists are cached
+    events.emit_many("game.updated", Game.objects.filter(pk__in=game_ids).only("pk"))
+    for game_id in game_ids:
+        transaction.on_commit(partial(delete_game_task.delay, game_id))
+    return len(game_ids)
+
+
+def get_progress(game_id: int) -> dict | None:
+    """Return the {"deleted": ..., "total": ...} rows of a game being deleted, or None if not started."""
+
+    return cache.get(PROGRESS_KEY.format(game_id))
+
+
+def _set_progress(game_id: int, deleted: int, total: int) -> None:
+    cache.set(PROGRESS_KEY.format(game_id), {"deleted": deleted, "total": total}, PROGRESS_TIMEOUT)
+
+
+def _delete_entries(game_id: int, batch_size: int) -> int:
+    entry_ids = Entry.objects.filter(question__game_id=game_id).values("pk")
+    # No handler on entries: deleted with a single statement, without loading them
+    nb_deleted, _ = Entry.objects.filter(pk__in=entry_ids[:batch_size]).delete()
+    return nb_deleted
+
+
+def _delete_plays(game_id: int, batch_size: int) -> int:
+    play_ids = list(Play.objects.filter(game_id=game_id).order_by().values_list("pk", flat=True)[:batch_size])
+    discard_plays(play_ids)
+    nb_deleted, _ = Play.objects.filter(pk__in=play_ids).delete()
+    return nb_deleted
+
+
+def _delete_answers(game_id: int, batch_size: int) -> int:
+    answer_ids = Answer.objects.filter(question__game_id=game_id).values("pk")
+    # Their questions are deleted next: no need to keep the question points consistent
+    with events.suppressed("answer.deleted"):
+        nb_deleted, _ = Answer.objects.filter(pk__in=answer_ids[:batch_size]).delete()
+    return nb_deleted
+
+
+def _delete_questions(game_id: int, batch_size: int) -> int:
+    question_ids = Question.objects.filter(game_id=game_id).values("pk")
+    nb_deleted, _ = Question.objects.filter(pk__in=question_ids[:batch_size]).delete()
+    return nb_deleted
+
+
+def delete_game(game_id: int, batch_size: int = BATCH_SIZE) -> int:
+    """Delete a game by batches of children, children first, and return the number of deleted rows.
+
+    Idempotent: an interrupted deletion resumes where it stopped.
+    """
+
+    total = (
+        Entry.objects.filter(question__game_id=game_id).count()
+        + Play.objects.filter(game_id=game_id).count()
+        + Answer.objects.filter(question__game_id=game_id).count()
+        + Question.objects.filter(game_id=game_id).count()
+        + 1
+    )
+    deleted = 0
+    _set_progress(game_id, deleted, total)
+
+    for delete_batch in (_delete_entries, _delete_plays, _delete_answers, _delete_questions):
+        while True:
+            # One short transaction per batch: the rows of a batch are only locked while they are deleted
+            with transaction.atomic():
+                nb_deleted = delete_batch(game_id, batch_size)
+            if not nb_deleted:
+                break
+            deleted += nb_deleted
+            _set_progress(game_id, deleted, total)
+
+    with transaction.atomic():
+        nb_deleted, _ = Game.objects.filter(pk=game_id).delete()
+    deleted += nb_deleted
+    cache.delete(PROGRESS_KEY.format(game_id))
+    return deleted
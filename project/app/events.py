@@ -0,0 +1,237 @@
+"""Domain events dispatched by batches.
+
+Model changes are emitted as events ("<model>.created", "<model>.updated", "<model>.deleted"), each one
+carrying the model instances concerned. A handler receives the instances of a whole batch at once:
+
+* immediate handlers run as soon as the event is emitted, inside the transaction, with the instances of the
+  emit call (a bulk operation emits all its instances at once, see ``emit_many``);
+* commit handlers run once the transaction is committed, once per handler with the deduplicated instances of
+  every event it handles emitted during the whole transaction (or at once, outside of any transaction). Events
+  are dropped with the transaction, or the savepoint, they were emitted in when it is rolled back.
+
+A handler can only accept some instances, e.g. the players whose score was saved (see ``on``).
+"""
+
+import copy
+import logging
+import threading
+from collections import defaultdict
+from collections.abc import Callable, Iterable
+from contextlib import contextmanager
+from functools import partial
+
+import django
+from django.core.exceptions import ImproperlyConfigured
+from django.db import models, transaction
+
+
+__all__ = [
+    "IMMEDIATE",
+    "ON_COMMIT",
+    "on",
+    "has_handlers",
+    "emit",
+    "emit_many",
+    "emit_model_event",
+    "suppressed",
+]
+
+
+logger = logging.getLogger(__name__)
+
+IMMEDIATE = "immediate"
+ON_COMMIT = "on_commit"
+
+# Event name -> phase -> handlers
+_handlers: dict[str, dict[str, list[Callable]]] = defaultdict(lambda: defaultdict(list))
+# Handler -> predicate of the instances it accepts
+_accepts: dict[Callable, Callable] = {}
+
+_local = threading.local()
+
+
+def on(*event_names: str, phase: str = ON_COMMIT, accepts: Callable | None = None):
+    """Register the decorated function as the handler of events, called with the list of their instances.
+
+    ``accepts`` filters the instances when they are emitted, while their state, like the fields saved, is
+    still the one of the emission.
+    """
+
+    def decorator(handler):
+        for event_name in event_names:
+            _handlers[event_name][phase].append(handler)
+        if accepts is not None:
+            _accepts[handler] = accepts
+        return handler
+
+    return decorator
+
+
+def has_handlers(event_name: str) -> bool:
+    return any(_handlers[event_name].values())
+
+
+def _suppressed_events() -> list[set[str]]:
+    if not hasattr(_local, "suppressed"):
+        _local.suppressed = []
+    return _local.suppressed
+
+
+@contextmanager
+def suppressed(*event_names: str):
+    """Do not dispatch the given events (every event without names) in the block, e.g. during an import."""
+
+    stack = _suppressed_events()
+    stack.append(set(event_names))
+    try:
+        yield
+    finally:
+        stack.pop()
+
+
+def _is_suppressed(event_name: str) -> bool:
+    return any(not names or event_name in names for names in _suppressed_events())
+
+
+def _accepted(handler: Callable, instances: list) -> list:
+    accepts = _accepts.get(handler)
+    return instances if accepts is None else [instance for instance in instances if accepts(instance)]
+
+
+def _run(handler: Callable, event_names, phase: str, instances: list) -> None:
+    if not instances:
+        return
+    if phase == IMMEDIATE:
+        handler(instances)
+        return
+    try:
+        handler(instances)
+    except Exception:  # pylint: disable=broad-except
+        # The transaction is already committed: do not prevent the other handlers from running
+        logger.exception("Handler %s of %s failed", handler.__qualname__, ", ".join(event_names))
+
+
+def _dispatch(event_name: str, phase: str, instances: list) -> None:
+    for handler in _handlers[event_name][phase]:
+        _run(handler, [event_name], phase, _accepted(handler, instances))
+
+
+# Django does not expose the callbacks registered with transaction.on_commit, nor drops them on savepoint rollback
+# in a public way: connection.run_on_commit is only read and reordered by the two helpers below, checked against
+# the Django versions whose layout, (savepoint ids, callback, robust) tuples, is known
+RUN_ON_COMMIT_VERSIONS = ((4, 2), (6, 0))
+
+if not RUN_ON_COMMIT_VERSIONS[0] <= django.VERSION[:2] < RUN_ON_COMMIT_VERSIONS[1]:
+    raise ImproperlyConfigured(
+        f"app.events relies on the layout of connection.run_on_commit, only checked for Django "
+        f"{RUN_ON_COMMIT_VERSIONS[0]} to {RUN_ON_COMMIT_VERSIONS[1]} (excluded)"
+    )
+
+
+def _commit_callbacks(connection) -> list:
+    callbacks = connection.run_on_commit
+    for entry in callbacks:
+        if not (isinstance(entry, tuple) and len(entry) == 3 and isinstance(entry[0], set) and callable(entry[1])):
+            raise ImproperlyConfigured(f"Unexpected connection.run_on_commit entry: {entry!r}")
+    return callbacks
+
+
+def _is_registered(connection, callback: Callable) -> bool:
+    """Whether the callback is still to run on commit: Django drops it with a savepoint that is rolled back."""
+
+    return any(registered == callback for _, registered, _ in reversed(_commit_callbacks(connection)))
+
+
+def _run_last(connection, callback: Callable) -> None:
+    """Move a registered callback after the others, keeping the savepoints it depends on."""
+
+    callbacks = _commit_callbacks(connection)
+    for index in range(len(callbacks) - 1, -1, -1):
+        if callbacks[index][1] == callback:
+            callbacks.append(callbacks.pop(index))
+            return
+
+
+class _Pending:
+    """Instances emitted during a transaction for the commit handlers, deduplicated by handler."""
+
+    def __init__(self):
+        # Handler -> names of the events it handles, instances accepted, by model and primary key
+        self.batches: dict[Callable, tuple[set[str], dict]] = {}
+        # Events emitted in the same savepoint, kept together
+        self.group: list[tuple[str, list]] | None = None
+        self.group_savepoint_ids: set | None = None
+
+    def add(self, connection, event_name, instances):
+        batch = [(handler, _accepted(handler, instances)) for handler in _handlers[event_name][ON_COMMIT]]
+        savepoint_ids = set(connection.savepoint_ids)
+        if self.group is not None and savepoint_ids == self.group_savepoint_ids:
+            self.group.append((event_name, batch))
+            return
+
+        # Kept by a callback of its own, that Django drops with the savepoint it was emitted in if rolled back
+        self.group = [(event_name, batch)]
+        self.group_savepoint_ids = savepoint_ids
+        transaction.on_commit(partial(self.keep, self.group), using=connection.alias)
+        # The flush has to run after the callbacks keeping the events
+        _run_last(connection, self.flush)
+
+    def keep(self, group):
+        for event_name, batch in group:
+            for handler, instances in batch:
+                event_names, handler_instances = self.batches.setdefault(handler, (set(), {}))
+                event_names.add(event_name)
+                for instance in instances:
+                    # Equal instances (same model, same primary key): the last emitted holds the latest values
+                    handler_instances[instance] = instance
+
+    def flush(self):
+        if getattr(_local, "pending", None) is self:
+            del _local.pending
+        for handler, (event_names, instances) in self.batches.items():
+            _run(handler, sorted(event_names), ON_COMMIT, list(instances.values()))
+
+
+def _get_pending(connection) -> _Pending:
+    pending = getattr(_local, "pending", None)
+    # Rolled back transaction or savepoint: its on_commit callbacks were discarded with it
+    if pending is not None and not _is_registered(connection, pending.flush):
+        pending = None
+    if pending is None:
+        pending = _local.pending = _Pending()
+        transaction.on_commit(pending.flush, using=connection.alias)
+    return pending
+
+
+def emit_many(event_name: str, instances: Iterable) -> None:
+    """Emit an event for many instances at once, typically after a bulk operation."""
+
+    if _is_suppressed(event_name):
+        return
+    instances = list(instances)
+    if not instances:
+        return
+
+    _dispatch(event_name, IMMEDIATE, instances)
+
+    if _handlers[event_name][ON_COMMIT]:
+        connection = transaction.get_connection()
+        if connection.in_atomic_block:
+            _get_pending(connection).add(connection, event_name, instances)
+        else:
+            _dispatch(event_name, ON_COMMIT, instances)
+
+
+def emit(event_name: str, *instances) -> None:
+    emit_many(event_name, instances)
+
+
+def emit_model_event(instance: models.Model, action: str) -> None:
+    """Emit "<model>.<action>" for the model of the instance and each of its parents (multi-table inheritance)."""
+
+    if action == "deleted":
+        # Django clears the primary key of deleted instances once they are deleted, before the commit
+        instance = copy.copy(instance)
+    model = type(instance)
+    for event_model in (model, *model._meta.get_parent_list()):  # pylint: disable=protected-access
+        emit(f"{event_model._meta.model_name}.{action}", instance)  # pylint: disable=protected-access
@@ -1,3 +1,5 @@
+from django.core.exceptions import ValidationError
+from django.db import models
 from django.forms import ModelChoiceField
 
 
@@ -5,3 +7,38 @@ class TreeChoiceField(ModelChoiceField):
 
     def label_from_instance(self, obj):
         return obj.deep_label
+
+
+class PrefetchedChoiceField(ModelChoiceField):
+    """Model choice field over objects fetched beforehand: neither rendering nor cleaning query the database.
+
+    Useful in formsets, where the choices of every form come from a single query.
+    """
+
+    def __init__(self, *args, objects=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.objects = objects
+
+    @property
+    def objects(self):
+        return list(self._objects.values())
+
+    @objects.setter
+    def objects(self, objects):
+        self._objects = {str(obj.pk): obj for obj in objects}
+        empty_choices = [] if self.empty_label is None else [("", self.empty_label)]
+        self.choices = empty_choices + [(obj.pk, self.label_from_instance(obj)) for obj in self._objects.values()]
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        if isinstance(value, models.Model):
+            value = value.pk
+        try:
+            return self._objects[str(value)]
+        except KeyError:
+            raise ValidationError(
+                self.error_messages["invalid_choice"],
+                code="invalid_choice",
+                params={"value": value},
+            )
@@ -1,8 +1,7 @@
 from datetime import timedelta
 
 from django import forms
-from django.forms import ModelChoiceField
-from django.forms.models import inlineformset_factory
+from django.forms.models import BaseInlineFormSet, inlineformset_factory
 from django.template.loader import render_to_string
 from django.utils.translation import gettext_lazy as gettext
 
@@ -35,10 +34,9 @@ from crispy_bootstrap5.bootstrap5 import (
     BS5Accordion,
     Switch,
 )
-from martor.utils import markdownify
 
 from .models import Game, Genre, Entry, Play, Question, Answer
-from .fields import TreeChoiceField
+from .fields import TreeChoiceField, PrefetchedChoiceField
 
 
 class GameForm(forms.ModelForm):
@@ -320,15 +318,19 @@ class BulkQuestionAnswerGenerationForm(forms.Form):
 
 class EntryForm(forms.ModelForm):
 
-    answer = ModelChoiceField(
+    answer = PrefetchedChoiceField(
         widget=forms.RadioSelect,
         queryset=Answer.objects.none()
     )
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, answers=None, **kwargs):
         super().__init__(*args, **kwargs)
 
-        self.fields["answer"].queryset = self.instance.question.answer_set.all()
+        # answers: the answers of every question of the game, shared by the forms of a formset
+        if answers is None:
+            self.fields["answer"].objects = self.instance.question.answer_set.all()
+        else:
+            self.fields["answer"].objects = answers.get(self.instance.question_id, ())
         self.fields["answer"].label = self.instance.question.text
 
         self.helper = FormHelper(self)
@@ -352,6 +354,13 @@ class EntryForm(forms.ModelForm):
             ),
         )
 
+    def _get_validation_exclusions(self):
+        exclusions = super()._get_validation_exclusions()
+        # Already checked among the prefetched answers by PrefetchedChoiceField: ForeignKey.validate would query
+        # the answer again, once per entry
+        exclusions.add("answer")
+        return exclusions
+
     class Meta:
         model = Entry
         fields = (
@@ -363,10 +372,53 @@ class EntryForm(forms.ModelForm):
         }
 
 
+class BasePlayFormSet(BaseInlineFormSet):
+    """Entries of a play, with their questions and answers fetched in a fixed number of queries."""
+
+    def get_queryset(self):
+        if not hasattr(self, "_queryset"):
+            self._queryset = (
+                super().get_queryset()
+                .select_related(None)
+                .select_related("question", "answer")
+                .order_by("question__order", "question_id")
+            )
+        return self._queryset
+
+    def get_answers(self) -> dict[int, list[Answer]]:
+        if not hasattr(self, "_answers"):
+            self._answers = {}
+            for answer in Answer.objects.filter(question__game_id=self.instance.game_id).order_by("question_id", "order"):
+                self._answers.setdefault(answer.question_id, []).append(answer)
+        return self._answers
+
+    def get_form_kwargs(self, index):
+        return super().get_form_kwargs(index) | {"answers": self.get_answers()}
+
+    def add_fields(self, form, index):
+        super().add_fields(form, index)
+        # The default primary key field validates each entry with its own query
+        pk_field = form.fields[self.model._meta.pk.name]
+        form.fields[self.model._meta.pk.name] = PrefetchedChoiceField(
+            queryset=self.model._default_manager.none(),
+            objects=self.get_queryset(),
+            initial=pk_field.initial,
+            required=False,
+            widget=pk_field.widget,
+        )
+
+    def save(self, commit=True):
+        entries = [form.save(commit=False) for form in self.forms if form.has_changed()]
+        if commit:
+            Entry.objects.bulk_update(entries, ["answer"])
+        return entries
+
+
 PlayFormSet = inlineformset_factory(
     Play,
     Entry,
     form=EntryForm,
+    formset=BasePlayFormSet,
     fields=["play", 'answer'],
     extra=0,
     can_delete=False,
@@ -424,7 +476,7 @@ class PlayForm(forms.ModelForm):
                     ),
                 ),
                 Row(
-                    HTML(markdownify(self.instance.game.description)),
+                    HTML(self.instance.game.description_as_html),
                 ),
                 Row(
                     QuestionLayout('entry_set'),
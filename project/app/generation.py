@@ -0,0 +1,112 @@
+"""Generation of numbered questions and answers for a game, by bounded batches.
+
+Run by a Celery task, whose progress is kept in the cache for the page polling it.
+"""
+
+from itertools import batched, product
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Max, OuterRef, PositiveSmallIntegerField, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from . import events
+from .models import Answer, Game, Question
+
+
+__all__ = [
+    "taken_question_texts",
+    "generate_questions_answers",
+    "get_progress",
+    "set_progress",
+]
+
+
+BATCH_SIZE = 1000
+
+PROGRESS_KEY = "question_generation:{}"
+PROGRESS_TIMEOUT = 60 * 60
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+def get_progress(task_id: str) -> dict:
+    """Return the {"state": ..., "done": ..., "total": ...} progress of a generation."""
+
+    return cache.get(PROGRESS_KEY.format(task_id)) or {"state": PENDING, "done": 0, "total": 0}
+
+
+def set_progress(task_id: str, state: str, done: int = 0, total: int = 0) -> None:
+    cache.set(PROGRESS_KEY.format(task_id), {"state": state, "done": done, "total": total}, PROGRESS_TIMEOUT)
+
+
+def _update_question_points(game_id: int) -> None:
+    # Questions are worth at least as much as their best answer: one statement for the whole game
+    best_points = (
+        Answer.objects.filter(question_id=OuterRef("pk"))
+        .order_by()
+        .values("question_id")
+        .annotate(best_points=Max("points"))
+        .values("best_points")
+    )
+    Question.objects.filter(game_id=game_id).update(
+        points=Greatest(F("points"), Coalesce(Subquery(best_points), 0, output_field=PositiveSmallIntegerField())),
+    )
+
+
+def taken_question_texts(game_id: int, num_questions: int, question_prefix: str) -> list[str]:
+    """Return the texts of the questions to generate already used in the game, questions being unique by text."""
+
+    texts = [f"{question_prefix} {i}" for i in range(1, num_questions + 1)]
+    taken = Question.objects.filter(game_id=game_id, text__in=texts).order_by("text").values_list("text", flat=True)
+    return list(taken)
+
+
+def generate_questions_answers(
+    game_id: int,
+    num_questions: int,
+    question_prefix: str,
+    num_answers_per_question: int,
+    answer_prefix: str,
+    batch_size: int = BATCH_SIZE,
+    progress=None,
+) -> tuple[int, int]:
+    """Create the questions and their answers, one transaction per batch, and return their numbers.
+
+    No signal is sent: the question points are fixed once, at the end. Raise ValueError, before creating
+    anything, if some of the questions already exist.
+    """
+
+    if taken := taken_question_texts(game_id, num_questions, question_prefix):
+        raise ValueError(f"Questions already in the game: {', '.join(taken)}")
+
+    # Whole questions with their answers in each batch
+    questions_per_batch = max(1, batch_size // (1 + num_answers_per_question))
+    nb_questions = nb_answers = 0
+    try:
+        for numbers in batched(range(1, num_questions + 1), questions_per_batch):
+            with transaction.atomic():
+                questions = Question.objects.bulk_create(
+                    [Question(game_id=game_id, text=f"{question_prefix} {i}", points=i) for i in numbers]
+                )
+                answers = Answer.objects.bulk_create(
+                    [
+                        Answer(question=question, text=f"{answer_prefix} {i}", points=i)
+                        for question, i in product(questions, range(1, num_answers_per_question + 1))
+                    ]
+                )
+            nb_questions += len(questions)
+            nb_answers += len(answers)
+            if progress is not None:
+                progress(nb_questions)
+    finally:
+        # Also when a question is created meanwhile: the batches already committed are kept, and reported by
+        # the progress
+        if nb_questions:
+            _update_question_points(game_id)
+            # Not "question.created": the generated questions come with their answers
+            events.emit_many("game.updated", Game.objects.filter(pk=game_id).only("pk"))
+    return nb_questions, nb_answers
@@ -0,0 +1,251 @@
+"""Set-based import of games, questions and answers from CSV rows."""
+
+import csv
+import gzip
+import multiprocessing
+import re
+import time
+import zlib
+from collections.abc import Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from contextlib import ExitStack
+from itertools import batched
+from pathlib import Path
+from queue import Empty
+
+from django.db import connections, transaction
+from django.utils.dateparse import parse_duration
+from django.utils.text import slugify
+from martor.utils import markdownify
+
+from . import events
+from .models import Game, Question, Answer, Genre
+
+
+__all__ = [
+    "open_csv",
+    "read_rows",
+    "load_genres",
+    "import_rows",
+    "shard_file",
+    "import_shards",
+]
+
+
+# Number suffixes of the slugs, "quiz-2" being allocated by the counter of "quiz" as well as by its own one
+SLUG_NUMBER = re.compile(r"(-\d+)+$")
+
+
+def open_csv(filename):
+    """Open an exported CSV file, compressed or not."""
+
+    if str(filename).endswith(".gz"):
+        return gzip.open(filename, mode="rt", newline="")
+    return open(filename, newline="")
+
+
+def read_rows(file) -> Iterator[dict[str, str]]:
+    """Lazily read the rows of an exported CSV file."""
+
+    return csv.DictReader(file, dialect=csv.unix_dialect)
+
+
+def load_genres(names: Iterable[str] = ()) -> dict[str, int]:
+    """Return every genre primary key by name, creating the missing ones first."""
+
+    genres = dict(Genre.objects.values_list("name", "pk"))
+    for name in sorted(set(names) - set(genres) - {""}):
+        genres[name] = Genre.objects.create(name=name).pk
+    return genres
+
+
+def _game_values(row, genres):
+    return {
+        "description": row["game__description"],
+        # bulk_create does not call Game.save, which renders it otherwise
+        "description_html": markdownify(row["game__description"]) if row["game__description"] else "",
+        "duration": parse_duration(row["game__duration"]) if row["game__duration"] else None,
+        "status": row["game__status"],
+        "level": int(row["game__level"]) if row["game__level"] else None,
+        "genre_id": genres.get(row["game__genre"]),
+    }
+
+
+def _import_batch(rows, genres):
+    # Games: only the new ones need a slug, existing ones keep theirs
+    games = {}
+    for row in rows:
+        if row["game__name"] not in games:
+            games[row["game__name"]] = _game_values(row, genres)
+    slugs = dict(Game.objects.filter(name__in=games).values_list("name", "slug"))
+    # Allocated for the whole batch at once, the counters being locked in a fixed order
+    if new_names := [name for name in games if name not in slugs]:
+        slugs |= dict(zip(new_names, Game.generate_slugs(new_names)))
+    imported_games = Game.objects.bulk_create(
+        [
+            Game(
+                name=name,
+                slug=slugs[name],
+                **values,
+            )
+            for name, values in games.items()
+        ],
+        update_conflicts=True,
+        unique_fields=["name"],
+        update_fields=["description", "description_html", "duration", "status", "level", "genre", "updated_at"],
+    )
+    game_ids = {game.name: game.pk for game in imported_games}
+    # Not "game.created": the questions are imported with the games
+    events.emit_many("game.updated", imported_games)
+
+    # Questions, deduplicated on the question_natural_key_constraint fields
+    questions = {}
+    for row in rows:
+        questions[(game_ids[row["game__name"]], row["question__text"])] = (
+            int(row["question__points"]),
+            int(row["question__order"]),
+        )
+    question_ids = {
+        (question.game_id, question.text): question.pk
+        for question in Question.objects.bulk_create(
+            [
+                Question(game_id=game_id, text=text, points=points, order=order)
+                for (game_id, text), (points, order) in questions.items()
+            ],
+            update_conflicts=True,
+            unique_fields=["game", "text"],
+            update_fields=["points", "order", "updated_at"],
+        )
+    }
+
+    # Answers, deduplicated on the answer_natural_key_constraint fields
+    answers = {}
+    for row in rows:
+        question_id = question_ids[(game_ids[row["game__name"]], row["question__text"])]
+        answers[(question_id, row["answer__text"])] = (
+            int(row["answer__points"]),
+            int(row["answer__order"]),
+        )
+    Answer.objects.bulk_create(
+        [
+            Answer(question_id=question_id, text=text, points=points, order=order)
+            for (question_id, text), (points, order) in answers.items()
+        ],
+        update_conflicts=True,
+        unique_fields=["question", "text"],
+        update_fields=["points", "order", "updated_at"],
+    )
+
+
+def import_rows(rows: Iterable[dict[str, str]], *, genres: dict[str, int], batch_size: int = 1000, progress=None) -> int:
+    """Import CSV rows by batches with one INSERT ... ON CONFLICT statement per model and per batch.
+
+    Signals are not sent, as with any ``bulk_create``, so no placeholder question or answer is created.
+    Return the number of imported rows.
+    """
+
+    nb_rows = 0
+    with transaction.atomic():
+        for batch in batched(rows, batch_size):
+            _import_batch(batch, genres)
+            nb_rows += len(batch)
+            if progress is not None:
+                progress(nb_rows)
+    return nb_rows
+
+
+def _slug_family(name: str) -> str:
+    # Games whose slugs can collide ("Quiz", "quiz!", "Quiz 2"...) share their slug counters: imported by the same
+    # worker, whose transaction holds the counter locks until the end of its shard
+    return SLUG_NUMBER.sub("", slugify(name))
+
+
+def shard_file(filename, nb_shards: int, directory) -> tuple[list[Path], set[str]]:
+    """Split an exported CSV file into shards, every row of a game, and of the games whose slugs can collide with
+    it, going to the same shard.
+
+    Return the shard paths and the names of the genres found while reading the file.
+    """
+
+    paths = [Path(directory) / f"shard_{index}.csv" for index in range(nb_shards)]
+    genre_names = set()
+    with open_csv(filename) as file, ExitStack() as stack:
+        reader = read_rows(file)
+        writers = []
+        for path in paths:
+            writer = csv.DictWriter(
+                stack.enter_context(open(path, mode="w", newline="")),
+                dialect=csv.unix_dialect,
+                fieldnames=reader.fieldnames,
+            )
+            writer.writeheader()
+            writers.append(writer)
+
+        for row in reader:
+            # crc32 is stable between processes, unlike hash()
+            writers[zlib.crc32(_slug_family(row["game__name"]).encode()) % nb_shards].writerow(row)
+            genre_names.add(row["game__genre"])
+    return paths, genre_names
+
+
+# Progress queue of the worker processes, inherited when they are forked
+_progress_queue = None
+
+
+def _init_worker(progress_queue) -> None:
+    global _progress_queue  # pylint: disable=global-statement
+    _progress_queue = progress_queue
+
+
+def _import_shard(index: int, path: Path, genres: dict[str, int], batch_size: int) -> tuple[int, int, float]:
+    """Import one shard in a worker process, with its own connection and transaction."""
+
+    def progress(nb_rows):
+        _progress_queue.put((index, nb_rows))
+
+    start = time.perf_counter()
+    try:
+        with open_csv(path) as file:
+            nb_rows = import_rows(read_rows(file), genres=genres, batch_size=batch_size, progress=progress)
+    finally:
+        connections.close_all()
+    return index, nb_rows, time.perf_counter() - start
+
+
+def _report_progress(progress_queue, progress) -> None:
+    while True:
+        try:
+            index, nb_rows = progress_queue.get_nowait()
+        except Empty:
+            return
+        if progress is not None:
+            progress(index, nb_rows)
+
+
+def import_shards(paths: list[Path], *, genres: dict[str, int], batch_size: int = 1000, progress=None):
+    """Import shards in parallel worker processes and yield (index, nb_rows, duration) as they finish.
+
+    The progress of the workers is sent back to the parent process, which calls ``progress(index, nb_rows)``.
+    """
+
+    # Forked children must not share the parent's database sockets
+    connections.close_all()
+    context = multiprocessing.get_context("fork")
+    progress_queue = context.Queue()
+    with ProcessPoolExecutor(
+        max_workers=len(paths),
+        mp_context=context,
+        initializer=_init_worker,
+        initargs=(progress_queue,),
+    ) as executor:
+        pending = {
+            executor.submit(_import_shard, index, path, genres, batch_size)
+            for index, path in enumerate(paths)
+        }
+        while pending:
+            done, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+            _report_progress(progress_queue, progress)
+            for future in done:
+                yield future.result()
+    # The workers have exited: their last progress messages are flushed
+    _report_progress(progress_queue, progress)
@@ -0,0 +1,247 @@
+"""Leaderboards kept in Redis sorted sets, one global and one per game.
+
+Top-N, rank and around-me windows cost O(log n) in Redis. When Redis is unavailable, or when a board has not
+been built yet, the same answers are computed by Postgres. Ties may then be ordered differently.
+"""
+
+import logging
+from itertools import batched
+
+from django.core.cache import cache
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+from .models import Player, Play
+
+
+__all__ = [
+    "top",
+    "rank",
+    "around",
+    "update_player_scores",
+    "update_game_scores",
+    "update_play_scores",
+    "remove_players",
+    "remove_game_players",
+    "rebuild",
+    "rebuild_game",
+]
+
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_KEY = "leaderboard:global"
+GAME_KEY = "leaderboard:game:{}"
+REBUILD_BATCH_SIZE = 5000
+
+# Only update a board that exists: a board with a few members would hide the others until it is rebuilt
+_ZADD_IF_EXISTS = """
+if redis.call("EXISTS", KEYS[1]) == 1 then
+    return redis.call("ZADD", KEYS[1], unpack(ARGV))
+end
+return 0
+"""
+
+
+def _key(game_id: int | None = None) -> str:
+    return cache.make_key(GLOBAL_KEY if game_id is None else GAME_KEY.format(game_id))
+
+
+def _redis():
+    try:
+        return get_redis_connection("default")
+    except NotImplementedError as exc:
+        # Another cache backend, as in some tests: behave as if Redis was down
+        raise RedisError(str(exc)) from exc
+
+
+# Postgres fallback
+
+def _scores(game_id: int | None = None):
+    """(player_id, score) queryset of the board."""
+
+    if game_id is None:
+        return Player.objects.non_polymorphic().order_by().values_list("pk", "score")
+    return Play.objects.filter(game_id=game_id).order_by().values_list("player_id", "score")
+
+
+def _db_rank(player_id, game_id):
+    scores = _scores(game_id)
+    player_field = "pk" if game_id is None else "player_id"
+    score = scores.filter(**{player_field: player_id}).values_list("score", flat=True).first()
+    if score is None:
+        return None
+    return scores.filter(score__gt=score).count(), score
+
+
+def _db_range(start, stop, game_id):
+    return list(_scores(game_id).order_by("-score", "pk")[start:stop + 1])
+
+
+# Redis
+
+def _redis_range(start, stop, game_id):
+    """Return the (player_id, score) of the positions, or None when the board is not built."""
+
+    with _redis().pipeline(transaction=False) as pipe:
+        pipe.exists(_key(game_id))
+        pipe.zrevrange(_key(game_id), start, stop, withscores=True)
+        exists, members = pipe.execute()
+    if not exists:
+        return None
+    return [(int(member), int(score)) for member, score in members]
+
+
+def _with_players(positions: list[tuple[int, int, int]]) -> list[dict]:
+    """Complete (rank, player_id, score) positions with the player names, with a single query."""
+
+    users = {
+        player["pk"]: player
+        for player in Player.objects.non_polymorphic()
+        .filter(pk__in=[player_id for _, player_id, _ in positions])
+        .values("pk", "user__username", "user__first_name", "user__last_name")
+    }
+    return [
+        {
+            "rank": position,
+            "player_id": player_id,
+            "username": users[player_id]["user__username"],
+            "first_name": users[player_id]["user__first_name"],
+            "last_name": users[player_id]["user__last_name"],
+            "score": score,
+        }
+        for position, player_id, score in positions
+        if player_id in users
+    ]
+
+
+def _positions(start: int, stop: int, game_id: int | None) -> list[tuple[int, int, int]]:
+    try:
+        members = _redis_range(start, stop, game_id)
+    except RedisError:
+        logger.warning("Leaderboard unavailable, falling back to the database", exc_info=True)
+        members = None
+    if members is None:
+        members = _db_range(start, stop, game_id)
+    return [(start + index + 1, player_id, score) for index, (player_id, score) in enumerate(members)]
+
+
+def top(limit: int = 10, game_id: int | None = None) -> list[dict]:
+    """Best players, globally or for a game, starting from rank 1."""
+
+    return _with_players(_positions(0, limit - 1, game_id))
+
+
+def rank(player_id: int, game_id: int | None = None) -> tuple[int, int] | None:
+    """Return the (rank, score) of a player, ranks starting from 1, or None if the player is not ranked."""
+
+    try:
+        with _redis().pipeline(transaction=False) as pipe:
+            pipe.exists(_key(game_id))
+            pipe.zrevrank(_key(game_id), player_id)
+            pipe.zscore(_key(game_id), player_id)
+            exists, position, score = pipe.execute()
+        if exists:
+            return None if position is None else (position + 1, int(score))
+    except RedisError:
+        logger.warning("Leaderboard unavailable, falling back to the database", exc_info=True)
+
+    result = _db_rank(player_id, game_id)
+    if result is None:
+        return None
+    nb_better, score = result
+    return nb_better + 1, score
+
+
+def around(player_id: int, radius: int = 2, game_id: int | None = None) -> list[dict]:
+    """The players ranked just before and after a player, the player included."""
+
+    player_rank = rank(player_id, game_id)
+    if player_rank is None:
+        return []
+    start = max(player_rank[0] - 1 - radius, 0)
+    return _with_players(_positions(start, player_rank[0] - 1 + radius, game_id))
+
+
+# Synchronisation
+
+def _zadd_if_exists(key: str, scores: dict[int, int]) -> None:
+    if not scores:
+        return
+    try:
+        arguments = [value for player_id, score in scores.items() for value in (score, player_id)]
+        _redis().eval(_ZADD_IF_EXISTS, 1, key, *arguments)
+    except RedisError:
+        # The board is rebuilt from the database by the rebuild_leaderboards command
+        logger.warning("Leaderboard update lost", exc_info=True)
+
+
+def update_player_scores(scores: dict[int, int]) -> None:
+    """Set the global scores of players (player_id -> score)."""
+
+    _zadd_if_exists(_key(), scores)
+
+
+def update_game_scores(game_id: int, scores: dict[int, int]) -> None:
+    """Set the scores of players for a game (player_id -> score)."""
+
+    _zadd_if_exists(_key(game_id), scores)
+
+
+def update_play_scores(play_ids) -> None:
+    """Set the scores of the players of the plays on the boards of their games."""
+
+    scores = {}
+    for game_id, player_id, score in Play.objects.filter(pk__in=play_ids).values_list("game_id", "player_id", "score"):
+        scores.setdefault(game_id, {})[player_id] = score
+    for game_id, game_scores in scores.items():
+        update_game_scores(game_id, game_scores)
+
+
+def _remove(key: str, player_ids) -> None:
+    if not player_ids:
+        return
+    try:
+        _redis().zrem(key, *player_ids)
+    except RedisError:
+        logger.warning("Leaderboard update lost", exc_info=True)
+
+
+def remove_players(player_ids) -> None:
+    _remove(_key(), list(player_ids))
+
+
+def remove_game_players(game_id: int, player_ids) -> None:
+    _remove(_key(game_id), list(player_ids))
+
+
+def _rebuild(game_id: int | None) -> int:
+    """Load a board in a temporary key, then swap it atomically with the current one."""
+
+    redis = _redis()
+    key = _key(game_id)
+    temporary_key = f"{key}:rebuild"
+    redis.delete(temporary_key)
+    nb_members = 0
+    for batch in batched(_scores(game_id).iterator(chunk_size=REBUILD_BATCH_SIZE), REBUILD_BATCH_SIZE):
+        redis.zadd(temporary_key, {player_id: score for player_id, score in batch})
+        nb_members += len(batch)
+
+    if nb_members:
+        redis.rename(temporary_key, key)
+    else:
+        # Redis cannot store an empty sorted set: the database answers for an empty board
+        redis.delete(key)
+    return nb_members
+
+
+def rebuild() -> int:
+    """Rebuild the global board from Player.score and return its number of players."""
+
+    return _rebuild(None)
+
+
+def rebuild_game(game_id: int) -> int:
+    """Rebuild the board of a game from its plays and return its number of players."""
+
+    return _rebuild(game_id)
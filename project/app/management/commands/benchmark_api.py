@@ -0,0 +1,88 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import URLError
+from urllib.request import urlopen
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.translation import gettext
+
+
+ENDPOINTS = {
+    "sync": ("/api-ninja/games/", "/api-ninja/games/{}"),
+    "async": ("/api-ninja/async/games/", "/api-ninja/async/games/{}"),
+}
+
+
+def measure(url: str) -> float:
+    start = time.perf_counter()
+    with urlopen(url, timeout=30) as response:
+        response.read()
+    return time.perf_counter() - start
+
+
+class Command(BaseCommand):
+    help = gettext("Compare the sync and async game endpoints of running servers: requests per second and latency")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sync-url",
+            type=str,
+            default="http://localhost:8000",
+            help=gettext("Base URL of the WSGI deployment (gunicorn)"),
+        )
+        parser.add_argument(
+            "--async-url",
+            type=str,
+            default="http://localhost:8001",
+            help=gettext("Base URL of the ASGI deployment (uvicorn project.asgi:application, port 8001 in production)"),
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=1000,
+            help=gettext("Number of requests per endpoint"),
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=50,
+            help=gettext("Number of requests in flight at the same time"),
+        )
+        parser.add_argument(
+            "--game-id",
+            type=int,
+            help=gettext("Game of the detail endpoint, none to only measure the list"),
+        )
+
+    def run(self, url: str, nb_requests: int, concurrency: int) -> None:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            durations = sorted(executor.map(measure, [url] * nb_requests))
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(
+            gettext("{}: {:.1f} requests/s, p50 {:.1f} ms, p99 {:.1f} ms").format(
+                url,
+                nb_requests / elapsed,
+                1000 * statistics.median(durations),
+                1000 * durations[min(len(durations) - 1, int(len(durations) * 0.99))],
+            )
+        )
+
+    def handle(self, *args, **kwargs):
+        base_urls = {"sync": kwargs["sync_url"].rstrip("/"), "async": kwargs["async_url"].rstrip("/")}
+        game_id = kwargs["game_id"]
+
+        try:
+            for mode, (list_path, detail_path) in ENDPOINTS.items():
+                paths = [list_path] if game_id is None else [list_path, detail_path.format(game_id)]
+                for path in paths:
+                    url = base_urls[mode] + path
+                    # Warm up: connections, caches
+                    measure(url)
+                    self.run(url, kwargs["requests"], kwargs["concurrency"])
+        except URLError as exc:
+            raise CommandError(gettext("The server could not be reached: {}").format(exc.reason)) from exc
+
+        self.stdout.write(self.style.SUCCESS(gettext("Benchmark done!")))
@@ -0,0 +1,61 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils.translation import gettext
+from rest_framework.renderers import JSONRenderer
+
+from app.models import Game
+from app.serializers import GameSerializer, game_rows, serialize_game_rows, render_json
+
+
+class Command(BaseCommand):
+    help = gettext("Compare the GameSerializer with the fast read path of the game list")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=100,
+            help=gettext("Number of games serialized at once"),
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=10,
+            help=gettext("Number of measures of each serializer, the best one being kept"),
+        )
+
+    @staticmethod
+    def measure(serialize, repeat: int) -> tuple[float, bytes]:
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            content = serialize()
+            best = min(best, time.perf_counter() - start)
+        return best, content
+
+    def handle(self, *args, **kwargs):
+        limit = kwargs["limit"]
+        repeat = kwargs["repeat"]
+        games = Game.objects.visible().order_by("name", "pk")[:limit]
+
+        drf_duration, drf_content = self.measure(
+            lambda: JSONRenderer().render(GameSerializer(games.full_tree(), many=True).data),
+            repeat,
+        )
+        fast_duration, fast_content = self.measure(
+            lambda: render_json(serialize_game_rows(list(game_rows(games)))),
+            repeat,
+        )
+
+        self.stdout.write(gettext("GameSerializer: {:.1f} ms").format(1000 * drf_duration))
+        self.stdout.write(
+            gettext("Fast read path: {:.1f} ms ({:.1f}x faster)").format(
+                1000 * fast_duration,
+                drf_duration / fast_duration,
+            )
+        )
+        if fast_content != drf_content:
+            self.stderr.write(self.style.WARNING(gettext("The outputs differ!")))
+            return
+        self.stdout.write(self.style.SUCCESS(gettext("Same output, {} bytes").format(len(fast_content))))
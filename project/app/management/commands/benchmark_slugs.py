@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils.translation import gettext
+
+from app.models import Game
+
+
+class Command(BaseCommand):
+    help = gettext("Measure the slug generation latency while games with the same name pile up")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--duplicates",
+            type=int,
+            default=2000,
+            help=gettext("Number of games sharing the same base slug to create"),
+        )
+        parser.add_argument(
+            "--step",
+            type=int,
+            default=500,
+            help=gettext("Number of games per reported measure"),
+        )
+
+    def handle(self, *args, **kwargs):
+        duplicates = kwargs["duplicates"]
+        step = kwargs["step"]
+
+        # Nothing is kept: everything is rolled back at the end
+        with transaction.atomic():
+            durations = []
+            for index in range(duplicates):
+                start = time.perf_counter()
+                slug = Game.generate_slug("Benchmark")
+                Game.objects.bulk_create([Game(name=f"benchmark {index}", slug=slug)])
+                durations.append(time.perf_counter() - start)
+
+                if len(durations) == step or index == duplicates - 1:
+                    self.stdout.write(
+                        gettext("{} to {} duplicates: {:.3f} ms per game").format(
+                            index + 1 - len(durations),
+                            index + 1,
+                            1000 * sum(durations) / len(durations),
+                        )
+                    )
+                    durations = []
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS(gettext("Benchmark done!")))
@@ -0,0 +1,122 @@
+import re
+from io import BytesIO
+from itertools import batched
+from pathlib import PurePosixPath
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.template.defaultfilters import filesizeformat
+from django.utils.translation import gettext
+from PIL import Image, UnidentifiedImageError
+
+from app.avatars import AVATAR_DIRECTORY, avatar_key, avatar_path, get_initials, render_avatar
+from app.models import Player
+
+
+# Name given by the former create_avatar task, with the suffix added by the storage to keep names unique
+GENERATED_NAME = re.compile(r"^generated_avatar_.+?(_[A-Za-z0-9]{7})?\.png$")
+
+
+class Command(BaseCommand):
+    help = gettext(
+        "Move the generated avatars to the content-addressed store and delete the duplicates, uploaded pictures "
+        "being left untouched"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help=gettext("Only report what would be done"),
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help=gettext("Number of players updated at once"),
+        )
+
+    def handle(self, *args, **kwargs):
+        dry_run = kwargs["dry_run"]
+
+        players = (
+            Player.objects
+            .non_polymorphic()
+            .exclude(Q(avatar__isnull=True) | Q(avatar=""))
+            .exclude(avatar__startswith=f"{AVATAR_DIRECTORY}/")
+            .order_by("pk")
+        )
+
+        created = set()
+        written_bytes = 0
+        old_names = set()
+        nb_players = nb_skipped = 0
+        for batch in batched(players.iterator(chunk_size=kwargs["batch_size"]), kwargs["batch_size"]):
+            moved = []
+            for player in batch:
+                old_name = player.avatar.name
+                try:
+                    with default_storage.open(old_name, "rb") as file:
+                        content = file.read()
+                    with Image.open(BytesIO(content)) as image:
+                        # The background colour, the initials being centred
+                        color = image.convert("RGB").getpixel((0, 0))
+                        size = image.width
+                except (OSError, UnidentifiedImageError):
+                    nb_skipped += 1
+                    continue
+
+                initials = get_initials(player.user)
+                # Only the generated avatars: an uploaded picture is kept as is
+                if content != render_avatar(initials, color, size) and not GENERATED_NAME.match(
+                    PurePosixPath(old_name).name
+                ):
+                    nb_skipped += 1
+                    continue
+
+                name = avatar_path(avatar_key(initials, color, size))
+                if name not in created and not default_storage.exists(name):
+                    # Rendered again rather than copied: the user may have been renamed since the old file was
+                    # drawn, and the shared file must show the initials of its name
+                    content = render_avatar(initials, color, size)
+                    if not dry_run:
+                        default_storage.save(name, ContentFile(content))
+                    written_bytes += len(content)
+                created.add(name)
+
+                player.avatar.name = name
+                moved.append(player)
+                old_names.add(old_name)
+
+            if moved and not dry_run:
+                Player.objects.non_polymorphic().bulk_update(moved, ["avatar"])
+            nb_players += len(moved)
+
+        # Files that are not referenced anymore
+        if dry_run:
+            still_referenced = set()
+        else:
+            still_referenced = set(
+                Player.objects.non_polymorphic().filter(avatar__in=old_names).values_list("avatar", flat=True)
+            )
+        freed_bytes = 0
+        for old_name in sorted(old_names - still_referenced):
+            freed_bytes += default_storage.size(old_name)
+            if not dry_run:
+                default_storage.delete(old_name)
+
+        self.stdout.write(
+            gettext("{} players moved to {} shared avatars, {} skipped.").format(nb_players, len(created), nb_skipped)
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                gettext("{} reclaimed ({} deleted, {} written){}").format(
+                    filesizeformat(freed_bytes - written_bytes),
+                    filesizeformat(freed_bytes),
+                    filesizeformat(written_bytes),
+                    gettext(" - dry run, nothing changed") if dry_run else "",
+                )
+            )
+        )
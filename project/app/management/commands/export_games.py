@@ -1,12 +1,57 @@
 import csv
+import gzip
+import io
+import sys
+from contextlib import contextmanager
 
 from django.core.management.base import BaseCommand
+from django.utils.duration import duration_string
 from django.utils.translation import gettext
 
-from app.models import Game
+from app.models import Answer, Game
 from app.serializers import GameSerializer
 
 
+GAME_FIELDS = ("name", "description", "duration", "status", "level", "genre")
+QUESTION_FIELDS = ("text", "points", "order")
+ANSWER_FIELDS = ("text", "points", "order")
+
+HEADER = (
+    *(f"game__{field_name}" for field_name in GAME_FIELDS),
+    *(f"question__{field_name}" for field_name in QUESTION_FIELDS),
+    *(f"answer__{field_name}" for field_name in ANSWER_FIELDS),
+)
+
+# Flat projection of one CSV row: one answer joined with its question and its game
+PROJECTION = (
+    "question__game__name",
+    "question__game__description",
+    "question__game__duration",
+    "question__game__status",
+    "question__game__level",
+    "question__game__genre__name",
+    "question__text",
+    "question__points",
+    "question__order",
+    "text",
+    "points",
+    "order",
+)
+
+DURATION_INDEX = PROJECTION.index("question__game__duration")
+
+
+def iter_rows(queryset, chunk_size):
+    """Yield CSV rows one at a time, without ever loading the whole export in memory."""
+
+    for row in queryset.values_list(*PROJECTION).iterator(chunk_size=chunk_size):
+        duration = row[DURATION_INDEX]
+        if duration is not None:
+            # Same format as the DRF DurationField used by GameSerializer
+            row = (*row[:DURATION_INDEX], duration_string(duration), *row[DURATION_INDEX + 1:])
+        yield row
+
+
 class Command(BaseCommand):
     help = gettext("Export Games to CSV")
 
@@ -17,21 +62,94 @@ class Command(BaseCommand):
             type=str,
             help=gettext("Export data for a specific game (by name)"),
         )
+        parser.add_argument(
+            "--stream",
+            action="store_true",
+            help=gettext("Stream rows from the database instead of serializing every game in memory"),
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help=gettext("Number of rows fetched from the database at once in streaming mode"),
+        )
+        parser.add_argument(
+            "--output",
+            type=str,
+            help=gettext("Output file, use - for the standard output"),
+        )
+        parser.add_argument(
+            "--gzip",
+            action="store_true",
+            help=gettext("Compress the output with gzip (implied by a .gz output file)"),
+        )
+
+    @contextmanager
+    def open_output(self, filename, compress):
+        if filename == "-":
+            if compress:
+                with gzip.GzipFile(fileobj=sys.stdout.buffer, mode="wb") as binary:
+                    with io.TextIOWrapper(binary, newline="") as file:
+                        yield file
+            else:
+                yield self.stdout
+            return
+
+        if compress:
+            with gzip.open(filename, mode="wt", newline="") as file:
+                yield file
+        else:
+            with open(filename, mode="w", newline="") as file:
+                yield file
 
     def handle(self, *args, **kwargs):
         game_name = kwargs.get("game_name", None)
+        compress = kwargs["gzip"]
+        filename = kwargs.get("output", None)
+
+        if filename is None:
+            filename = f"exports/{game_name}_export.csv" if game_name is not None else "exports/games_export.csv"
+            if compress:
+                filename += ".gz"
+        compress = compress or filename.endswith(".gz")
+
+        # Keep the standard output clean for the CSV content
+        messages = self.stderr if filename == "-" else self.stdout
+
+        if game_name is not None and not Game.objects.filter(name=game_name).exists():
+            messages.write(self.style.ERROR(gettext(f"The game {game_name} does not exists!")))
+            return
+
+        if kwargs["stream"]:
+            self.export_stream(filename, compress, messages, game_name, kwargs["chunk_size"])
+        else:
+            self.export_serialized(filename, compress, messages, game_name)
+
+    def export_stream(self, filename, compress, messages, game_name, chunk_size):
+        queryset = Answer.objects.order_by(
+            "question__game__name",
+            "question__order",
+            "question_id",
+            "order",
+            "id",
+        )
+        if game_name is not None:
+            queryset = queryset.filter(question__game__name=game_name)
+
+        with self.open_output(filename, compress) as file:
+            writer = csv.writer(file, dialect=csv.unix_dialect)
+            writer.writerow(HEADER)
+            writer.writerows(iter_rows(queryset, chunk_size))
+
+        messages.write(self.style.SUCCESS(gettext("Data exported successfully!")))
+
+    def export_serialized(self, filename, compress, messages, game_name):
         data = []
 
         if game_name is not None:
-            try:
-                games = [Game.objects.get_by_natural_key(game_name=game_name)]
-                filename = f"exports/{game_name}_export.csv"
-            except Game.DoesNotExist:
-                self.stdout.write(self.style.ERROR(gettext(f"The game {game_name} does not exists!")))
-                return
+            games = Game.objects.full_tree().filter(name=game_name)
         else:
-            filename = "exports/games_export.csv"
-            games = Game.objects.all()
+            games = Game.objects.full_tree()
 
         for game in games:
             game_data = GameSerializer(game)
@@ -46,11 +164,12 @@ class Command(BaseCommand):
                     )
 
         if len(data) == 0:
-            self.stdout.write(self.style.NOTICE(gettext("There is no data to export!")))
+            messages.write(self.style.NOTICE(gettext("There is no data to export!")))
+            return
 
-        with open(filename, mode="w") as file:
+        with self.open_output(filename, compress) as file:
             writer = csv.DictWriter(file, dialect=csv.unix_dialect, fieldnames=data[0].keys())
             writer.writeheader()
             writer.writerows(data)
 
-        self.stdout.write(self.style.SUCCESS(gettext("Data exported successfully!")))
+        messages.write(self.style.SUCCESS(gettext("Data exported successfully!")))
@@ -1,12 +1,15 @@
 import csv
 import pathlib
+import time
+from tempfile import TemporaryDirectory
 
 from django.core.management.base import BaseCommand
-from django.db.models.signals import post_save, Signal
 from django.utils.translation import gettext
 
+from app import events
+from app.importers import open_csv, read_rows, load_genres, import_rows, shard_file, import_shards
 from app.models import Game, Question, Answer, Genre
-from app.signals import game_create_first_questions, question_create_first_answers
+
 
 class Command(BaseCommand):
     help = gettext("Import Games from CSV")
@@ -18,18 +21,51 @@ class Command(BaseCommand):
             type=str,
             help=gettext("Import data for a specific game (by name)"),
         )
+        parser.add_argument(
+            "--input",
+            type=str,
+            help=gettext("CSV file to import, compressed with gzip if its name ends with .gz"),
+        )
+        parser.add_argument(
+            "--bulk",
+            action="store_true",
+            help=gettext("Import rows by batches with set-based queries"),
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help=gettext("Number of CSV rows imported at once in bulk mode"),
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help=gettext("Number of worker processes, each importing a shard of the games (implies --bulk)"),
+        )
 
     def handle(self, *args, **kwargs):
         game_name = kwargs.get("game_name", None)
         data = []
 
-        if game_name is not None:
+        if kwargs.get("input") is not None:
+            filename = pathlib.Path(kwargs["input"])
+        elif game_name is not None:
             filename = pathlib.Path(f"exports/{game_name}_export.csv")
-            if not filename.exists():
-                self.stdout.write(self.style.ERROR(gettext(f"The file {filename} does not exists!")))
-                return
         else:
-            filename = "exports/games_export.csv"
+            filename = pathlib.Path("exports/games_export.csv")
+
+        if not filename.exists():
+            self.stdout.write(self.style.ERROR(gettext(f"The file {filename} does not exists!")))
+            return
+
+        if kwargs["workers"] > 1:
+            self.import_parallel(filename, kwargs["batch_size"], kwargs["workers"])
+            return
+
+        if kwargs["bulk"]:
+            self.import_bulk(filename, kwargs["batch_size"])
+            return
 
         with open(filename) as file:
             reader = csv.DictReader(file, dialect=csv.unix_dialect)
@@ -38,53 +74,89 @@ class Command(BaseCommand):
         old_game_datum = old_question_datum = {}
         game = question = None
 
-        post_save.disconnect(
-            game_create_first_questions,
-            sender=Game,
-            dispatch_uid="game_create_first_questions"
-        )
-        post_save.disconnect(
-            question_create_first_answers,
-            sender=Question,
-            dispatch_uid="question_create_first_answers"
-        )
+        # The imported games come with their own questions and answers
+        with events.suppressed("game.created", "question.created"):
+            for datum in data:
+                game_datum = {
+                    k.split("__", 1)[-1]: v
+                    for k, v in datum.items()
+                    if k is not None and k.startswith("game__")
+                } | {
+                    "genre": Genre.objects.get_by_natural_key(name=datum["game__genre"])
+                }
+                question_datum = {
+                    k.split("__", 1)[-1]: v
+                    for k, v in datum.items()
+                    if k is not None and k.startswith("question__")
+                }
+                answer_datum = {
+                    k.split("__", 1)[-1]: v
+                    for k, v in datum.items()
+                    if k is not None and k.startswith("answer__")
+                }
+                if game_datum != old_game_datum:
+                    game, _ = Game.objects.get_or_create(
+                        name=game_datum.pop("name"),
+                        defaults=game_datum,
+                    )
+                    old_game_datum = game_datum
 
-        for datum in data:
-            game_datum = {
-                k.split("__", 1)[-1]: v
-                for k, v in datum.items()
-                if k is not None and k.startswith("game__")
-            } | {
-                "genre": Genre.objects.get_by_natural_key(name=datum["game__genre"])
-            }
-            question_datum = {
-                k.split("__", 1)[-1]: v
-                for k, v in datum.items()
-                if k is not None and k.startswith("question__")
-            }
-            answer_datum = {
-                k.split("__", 1)[-1]: v
-                for k, v in datum.items()
-                if k is not None and k.startswith("answer__")
-            }
-            if game_datum != old_game_datum:
-                game, _ = Game.objects.get_or_create(
-                    name=game_datum.pop("name"),
-                    defaults=game_datum,
+                if question_datum != old_question_datum:
+                    question, _ = Question.objects.get_or_create(
+                        game_id=game.pk,
+                        text=question_datum.pop("text"),
+                        defaults=question_datum,
+                    )
+                    old_question_datum = question_datum
+
+                Answer.objects.get_or_create(
+                    question_id=question.pk,
+                    text=answer_datum.pop("text"),
+                    defaults=answer_datum,
                 )
-                old_game_datum = game_datum
+        self.stdout.write(self.style.SUCCESS(gettext("Data imported successfully!")))
 
-            if question_datum != old_question_datum:
-                question, _ = Question.objects.get_or_create(
-                    game_id=game.pk,
-                    text=question_datum.pop("text"),
-                    defaults=question_datum,
+    def import_bulk(self, filename, batch_size):
+        with open_csv(filename) as file:
+            genres = load_genres(row["game__genre"] for row in read_rows(file))
+
+        start = time.perf_counter()
+        with open_csv(filename) as file:
+            nb_rows = import_rows(read_rows(file), genres=genres, batch_size=batch_size)
+        duration = time.perf_counter() - start
+
+        self.stdout.write(
+            gettext("{} rows imported in {:.2f}s ({:.0f} rows/s)").format(
+                nb_rows, duration, nb_rows / duration if duration else 0
+            )
+        )
+        self.stdout.write(self.style.SUCCESS(gettext("Data imported successfully!")))
+
+    def import_parallel(self, filename, batch_size, workers):
+        start = time.perf_counter()
+        with TemporaryDirectory() as directory:
+            paths, genre_names = shard_file(filename, workers, directory)
+            # Genres are shared by every shard: create them once, before forking
+            genres = load_genres(genre_names)
+
+            def progress(index, shard_rows):
+                self.stdout.write(gettext("Worker {}: {} rows imported so far").format(index, shard_rows))
+
+            nb_rows = 0
+            for index, shard_rows, duration in import_shards(
+                paths, genres=genres, batch_size=batch_size, progress=progress
+            ):
+                nb_rows += shard_rows
+                self.stdout.write(
+                    gettext("Worker {}: {} rows imported in {:.2f}s ({:.0f} rows/s)").format(
+                        index, shard_rows, duration, shard_rows / duration if duration else 0
+                    )
                 )
-                old_question_datum = question_datum
+        duration = time.perf_counter() - start
 
-            Answer.objects.get_or_create(
-                question_id=question.pk,
-                text=answer_datum.pop("text"),
-                defaults=answer_datum,
+        self.stdout.write(
+            gettext("{} rows imported in {:.2f}s ({:.0f} rows/s) by {} workers").format(
+                nb_rows, duration, nb_rows / duration if duration else 0, workers
             )
+        )
         self.stdout.write(self.style.SUCCESS(gettext("Data imported successfully!")))
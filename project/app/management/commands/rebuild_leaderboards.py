@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.utils.translation import gettext
+
+from app import leaderboard
+from app.models import Play
+
+
+class Command(BaseCommand):
+    help = gettext("Rebuild the Redis leaderboards from the database")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--game",
+            type=int,
+            action="append",
+            dest="game_ids",
+            help=gettext("Only rebuild the board of this game (can be repeated)"),
+        )
+
+    def handle(self, *args, **kwargs):
+        game_ids = kwargs["game_ids"]
+        if game_ids is None:
+            nb_players = leaderboard.rebuild()
+            self.stdout.write(gettext("Global leaderboard: {} players").format(nb_players))
+            game_ids = Play.objects.order_by("game_id").values_list("game_id", flat=True).distinct()
+
+        nb_games = 0
+        for game_id in game_ids:
+            leaderboard.rebuild_game(game_id)
+            nb_games += 1
+
+        self.stdout.write(self.style.SUCCESS(gettext("{} game leaderboards rebuilt!").format(nb_games)))
@@ -0,0 +1,69 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils.translation import gettext
+
+from app.models import Game, Play, Question
+
+
+def count_per_game(model):
+    """Number of rows of the model for the game of the outer query."""
+
+    return Coalesce(
+        Subquery(
+            model.objects
+            .filter(game=OuterRef("pk"))
+            .order_by()
+            .values("game")
+            .annotate(count=Count("pk"))
+            .values("count")
+        ),
+        0,
+    )
+
+
+class Command(BaseCommand):
+    help = gettext("Recompute the question and player counters of the games and report the drift")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fix",
+            action="store_true",
+            help=gettext("Store the recomputed counters of the drifting games"),
+        )
+
+    def handle(self, *args, **kwargs):
+        drifting = list(
+            Game.objects
+            .annotate(
+                expected_nb_questions=count_per_game(Question),
+                expected_nb_players=count_per_game(Play),
+            )
+            .filter(
+                ~Q(nb_questions=F("expected_nb_questions"))
+                | ~Q(nb_players=F("expected_nb_players"))
+            )
+            .order_by("name")
+            .values_list("pk", "name", "nb_questions", "expected_nb_questions", "nb_players", "expected_nb_players")
+        )
+
+        if not drifting:
+            self.stdout.write(self.style.SUCCESS(gettext("Every game counter is up to date!")))
+            return
+
+        for _, name, nb_questions, expected_nb_questions, nb_players, expected_nb_players in drifting:
+            self.stdout.write(
+                gettext("{}: {} questions instead of {}, {} players instead of {}").format(
+                    name, nb_questions, expected_nb_questions, nb_players, expected_nb_players,
+                )
+            )
+
+        if not kwargs["fix"]:
+            self.stdout.write(self.style.WARNING(gettext("{} games drifting, use --fix to repair them").format(len(drifting))))
+            return
+
+        nb_fixed = Game.objects.filter(pk__in=[pk for pk, *_ in drifting]).update(
+            nb_questions=count_per_game(Question),
+            nb_players=count_per_game(Play),
+        )
+        self.stdout.write(self.style.SUCCESS(gettext("{} games fixed!").format(nb_fixed)))
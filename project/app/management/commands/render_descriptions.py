@@ -0,0 +1,40 @@
+from itertools import batched
+
+from django.core.management.base import BaseCommand
+from django.utils.translation import gettext
+
+from app.models import Game
+
+
+class Command(BaseCommand):
+    help = gettext("Render the Markdown descriptions of the games to HTML")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help=gettext("Render every description again, not only the missing ones (e.g. after a martor upgrade)"),
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help=gettext("Number of games updated at once"),
+        )
+
+    def handle(self, *args, **kwargs):
+        batch_size = kwargs["batch_size"]
+
+        games = Game.objects.exclude(description="").only("pk", "description", "description_html").order_by("pk")
+        if not kwargs["all"]:
+            games = games.filter(description_html="")
+
+        nb_games = 0
+        for batch in batched(games.iterator(chunk_size=batch_size), batch_size):
+            for game in batch:
+                game.render_description(force=True)
+            # No signal and no counter written back
+            Game.objects.bulk_update(batch, ["description_html"])
+            nb_games += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(gettext("{} descriptions rendered!").format(nb_games)))
@@ -0,0 +1,60 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils.translation import gettext
+from redis.exceptions import RedisError
+
+from app import leaderboard
+from app.models import Game
+from app.scoring import CHUNK_SIZE, rescore_game, rescore_all, recompute_player_scores
+
+
+class Command(BaseCommand):
+    help = gettext("Recompute the scores of the plays from their entries, and of their players")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--game-name",
+            type=str,
+            help=gettext("Only rescore the plays of this game (by name)"),
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=CHUNK_SIZE,
+            help=gettext("Number of plays rescored per transaction"),
+        )
+        parser.add_argument(
+            "--players",
+            action="store_true",
+            help=gettext("Then set every player score to the sum of their play scores"),
+        )
+
+    def handle(self, *args, **kwargs):
+        game_name = kwargs.get("game_name", None)
+        chunk_size = kwargs["chunk_size"]
+
+        def progress(nb_plays):
+            self.stdout.write(gettext("{} plays rescored").format(nb_plays))
+
+        start = time.perf_counter()
+        if game_name is not None:
+            try:
+                game = Game.objects.get(name=game_name)
+            except Game.DoesNotExist:
+                self.stderr.write(self.style.ERROR(gettext(f"The game {game_name} does not exists!")))
+                return
+            nb_plays = rescore_game(game.pk, chunk_size, progress)
+        else:
+            nb_plays = rescore_all(chunk_size, progress)
+        self.stdout.write(
+            self.style.SUCCESS(gettext("{} plays rescored in {:.2f}s").format(nb_plays, time.perf_counter() - start))
+        )
+
+        if kwargs["players"]:
+            nb_players = recompute_player_scores()
+            try:
+                leaderboard.rebuild()
+            except RedisError:
+                self.stderr.write(self.style.WARNING(gettext("The global leaderboard could not be rebuilt")))
+            self.stdout.write(self.style.SUCCESS(gettext("{} player scores updated!").format(nb_players)))
@@ -1,10 +1,16 @@
 from django.contrib.postgres.search import TrigramSimilarity
-from django.db import models
+from django.db import IntegrityError, connections, models, transaction
+from django.utils.translation import gettext
 
 from mptt.managers import TreeManager
 from polymorphic.managers import PolymorphicManager
 
 from .enums import GameStatus, GameLevel
+from .events import emit
+
+
+# Attempts to clone a game under a free copy name, taken by another game meanwhile
+CLONE_ATTEMPTS = 5
 
 
 class PlayerManager(PolymorphicManager):
@@ -26,20 +32,140 @@ class PlayerManager(PolymorphicManager):
         return self.non_polymorphic().get(user__username=user_username)
 
 
-class GameManager(models.Manager):
+class GameQuerySet(models.QuerySet):
+    """Games fetched with the minimal shape needed by each view: nothing is prefetched by default."""
+
+    def _questions(self):
+        question_model = self.model._meta.get_field("question_set").related_model
+        # Neither the answers nor the game: the game is set by the prefetch itself
+        return question_model.objects.prefetch_related(None).select_related(None).order_by("game_id", "order", "pk")
+
+    def _answers(self):
+        question_model = self.model._meta.get_field("question_set").related_model
+        answer_model = question_model._meta.get_field("answer_set").related_model
+        return answer_model.objects.select_related(None).order_by("question_id", "order", "pk")
+
+    def visible(self):
+        """Games not waiting for their deletion."""
+        return self.filter(deletion_requested_at__isnull=True)
+
+    def summary(self):
+        """Only the columns displayed in lists."""
+        return self.only("name", "slug", "duration", "status", "level", "genre")
+
+    def with_questions(self):
+        return self.prefetch_related(models.Prefetch("question_set", queryset=self._questions()))
+
+    def full_tree(self):
+        """Games, questions and answers in three queries, as needed by the nested serializers."""
+        return self.select_related("genre").prefetch_related(
+            models.Prefetch("question_set", queryset=self._questions()),
+            models.Prefetch("question_set__answer_set", queryset=self._answers()),
+        )
 
-    def get_queryset(self):
-        queryset = super().get_queryset()
-        return queryset.prefetch_related("question_set", "question_set__answer_set")
+
+class GameManager(models.Manager.from_queryset(GameQuerySet)):
 
     @property
     def playable(self):
-        queryset = self.get_queryset()
+        queryset = self.get_queryset().visible()
         return queryset.filter(status=GameStatus.ONGOING)
 
     def get_by_natural_key(self, game_name: str):
         return self.get(name=game_name)
 
+    def copy_name(self, game_name: str) -> str:
+        """First free name among "<name> (copy)", "<name> (copy 2)"..., truncated to fit."""
+
+        max_length = self.model._meta.get_field("name").max_length
+        number = 1
+        while True:
+            suffix = gettext(" (copy)") if number == 1 else gettext(" (copy {})").format(number)
+            name = game_name[:max_length - len(suffix)] + suffix
+            if not self.filter(name=name).exists():
+                return name
+            number += 1
+
+    def clone(self, game_id: int, name: str | None = None):
+        """Copy a game with all its questions and answers, with three INSERT ... SELECT statements.
+
+        The copy is a draft with its own slug. No placeholder question is created for it. Without a name, the first
+        free copy name is taken, and the next one if another game takes it meanwhile.
+        """
+
+        source_name = self.filter(pk=game_id).values_list("name", flat=True).get()
+        for attempt in range(CLONE_ATTEMPTS):
+            try:
+                clone_id = self._insert_clone(game_id, name if name is not None else self.copy_name(source_name))
+            except IntegrityError:
+                if name is not None or attempt == CLONE_ATTEMPTS - 1:
+                    raise
+            else:
+                break
+
+        clone = self.get(pk=clone_id)
+        # Not "game.created": the questions are copied with the game
+        emit("game.updated", clone)
+        return clone
+
+    def _insert_clone(self, game_id: int, name: str) -> int:
+        question_model = self.model._meta.get_field("question_set").related_model
+        answer_model = question_model._meta.get_field("answer_set").related_model
+        connection = connections[self.db]
+        quote_name = connection.ops.quote_name
+
+        def copied_columns(model, *excluded):
+            excluded = {"id", "created_at", "updated_at", *excluded}
+            return [quote_name(field.column) for field in model._meta.concrete_fields if field.name not in excluded]
+
+        game_columns = copied_columns(
+            self.model, "name", "slug", "status", "deletion_requested_at", *self.model.COUNTER_FIELDS
+        )
+        question_columns = copied_columns(question_model, "game")
+        answer_columns = copied_columns(answer_model, "question")
+        slug = self.model.generate_slug(name)
+        game_table = quote_name(self.model._meta.db_table)
+        question_table = quote_name(question_model._meta.db_table)
+        answer_table = quote_name(answer_model._meta.db_table)
+
+        with transaction.atomic(using=self.db), connection.cursor() as cursor:
+            # The counters are then maintained by the triggers on the questions
+            cursor.execute(
+                f"""
+                INSERT INTO {game_table} (name, slug, status, nb_questions, nb_players, created_at, updated_at,
+                                          {", ".join(game_columns)})
+                SELECT %(name)s, %(slug)s, %(status)s, 0, 0, now(), now(), {", ".join(game_columns)}
+                FROM {game_table}
+                WHERE id = %(source)s
+                RETURNING id
+                """,
+                {"name": name, "slug": slug, "status": GameStatus.DRAFT, "source": game_id},
+            )
+            clone_id = cursor.fetchone()[0]
+            cursor.execute(
+                f"""
+                INSERT INTO {question_table} (game_id, created_at, updated_at, {", ".join(question_columns)})
+                SELECT %(clone)s, now(), now(), {", ".join(question_columns)}
+                FROM {question_table}
+                WHERE game_id = %(source)s
+                """,
+                {"clone": clone_id, "source": game_id},
+            )
+            # Questions are unique by text within a game: the copy of a question is found by its text
+            cursor.execute(
+                f"""
+                INSERT INTO {answer_table} (question_id, created_at, updated_at, {", ".join(answer_columns)})
+                SELECT copied_question.id, now(), now(), {", ".join(f"answer.{column}" for column in answer_columns)}
+                FROM {answer_table} AS answer
+                JOIN {question_table} AS question ON question.id = answer.question_id
+                JOIN {question_table} AS copied_question
+                    ON copied_question.game_id = %(clone)s AND copied_question.text = question.text
+                WHERE question.game_id = %(source)s
+                """,
+                {"clone": clone_id, "source": game_id},
+            )
+        return clone_id
+
     def search_by_name(self, game_name: str, *, similarity=0.3):
         return self.annotate(
             similarity=TrigramSimilarity("name", game_name)
@@ -96,13 +222,7 @@ class GenreManager(TreeManager):
 
 
 class StatGameManager(models.Manager):
-
-    def get_queryset(self):
-        queryset = super().get_queryset()
-        return queryset.annotate(
-            nb_questions=models.Count("question_set", distinct=True),
-            nb_players=models.Count("play", distinct=True),
-        )
+    # nb_questions and nb_players are counters stored on the games themselves
 
     def get_by_natural_key(self, game_name: str):
         return self.get(name=game_name)
@@ -113,3 +233,56 @@ class EntryManager(models.Manager):
     def get_queryset(self):
         queryset = super().get_queryset()
         return queryset.select_related("play", "question__game")
+
+
+class SlugCounterManager(models.Manager):
+
+    def allocate(self, base_slug: str) -> int:
+        """Atomically increment and return the counter of a base slug, starting at 1.
+
+        Concurrent transactions allocating the same base slug wait for each other on the counter row lock,
+        so that they never get the same number.
+        """
+        table = connections[self.db].ops.quote_name(self.model._meta.db_table)
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {table} (base_slug, last_number) VALUES (%s, 1)
+                ON CONFLICT (base_slug) DO UPDATE SET last_number = {table}.last_number + 1
+                RETURNING last_number
+                """,
+                [base_slug],
+            )
+            return cursor.fetchone()[0]
+
+    def allocate_many(self, quantities: dict[str, int]) -> dict[str, int]:
+        """Atomically reserve numbers for many base slugs (base slug -> quantity) with a single statement.
+
+        Return the last number reserved for each base slug, the reserved numbers being the quantity up to it.
+        """
+        if not quantities:
+            return {}
+        # Always in the same order, so that concurrent allocations cannot deadlock on the counter rows
+        items = sorted(quantities.items())
+        table = connections[self.db].ops.quote_name(self.model._meta.db_table)
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {table} (base_slug, last_number) VALUES {", ".join(["(%s, %s)"] * len(items))}
+                ON CONFLICT (base_slug) DO UPDATE SET last_number = {table}.last_number + EXCLUDED.last_number
+                RETURNING base_slug, last_number
+                """,
+                [value for item in items for value in item],
+            )
+            return dict(cursor.fetchall())
+
+
+class GameStatisticsManager(models.Manager):
+
+    def refresh(self, concurrently: bool = True) -> None:
+        """Recompute the materialized view, without blocking its readers when done concurrently."""
+
+        connection = connections[self.db]
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(f"REFRESH MATERIALIZED VIEW {'CONCURRENTLY ' if concurrently else ''}{table}")
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0016_rename_entry_set_play_answer_set_entry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlugCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('base_slug', models.SlugField(max_length=36, unique=True, verbose_name='base slug')),
+                ('last_number', models.PositiveIntegerField(default=1, verbose_name='last number')),
+            ],
+            options={
+                'verbose_name': 'slug counter',
+                'verbose_name_plural': 'slug counters',
+            },
+        ),
+        # Start every counter from the highest number already used by the existing slugs
+        migrations.RunSQL(
+            sql="""
+                INSERT INTO app_slugcounter (base_slug, last_number)
+                SELECT base_slug, MAX(number)
+                FROM (
+                    SELECT
+                        regexp_replace(slug, '-[0-9]+$', '') AS base_slug,
+                        COALESCE(substring(slug FROM '-([0-9]+)$')::integer, 1) AS number
+                    FROM app_game
+                ) AS slugs
+                GROUP BY base_slug;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,103 @@
+# Generated by Django 5.2.7 on 2026-10-18 14:03
+
+from django.db import migrations, models
+
+
+def counter_sql(table, counter):
+    """Keep app_game.<counter> equal to the number of rows of <table> per game.
+
+    Statement-level triggers with transition tables: a bulk_create or a cascade deletion of thousands of rows
+    updates each game once, whatever the number of rows.
+    """
+
+    function = f"{table}_update_game_{counter}"
+    return f"""
+        CREATE FUNCTION {function}() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                UPDATE app_game SET {counter} = app_game.{counter} + delta.value
+                FROM (SELECT game_id, COUNT(*) AS value FROM new_rows GROUP BY game_id) AS delta
+                WHERE app_game.id = delta.game_id;
+            ELSIF TG_OP = 'DELETE' THEN
+                UPDATE app_game SET {counter} = app_game.{counter} - delta.value
+                FROM (SELECT game_id, COUNT(*) AS value FROM old_rows GROUP BY game_id) AS delta
+                WHERE app_game.id = delta.game_id;
+            ELSE
+                -- Only the rows moved to another game change the counters
+                UPDATE app_game SET {counter} = app_game.{counter} + delta.value
+                FROM (
+                    SELECT game_id, SUM(value) AS value
+                    FROM (
+                        SELECT old_rows.game_id, -1 AS value
+                        FROM old_rows JOIN new_rows USING (id)
+                        WHERE old_rows.game_id <> new_rows.game_id
+                        UNION ALL
+                        SELECT new_rows.game_id, 1 AS value
+                        FROM old_rows JOIN new_rows USING (id)
+                        WHERE old_rows.game_id <> new_rows.game_id
+                    ) AS moves
+                    GROUP BY game_id
+                ) AS delta
+                WHERE app_game.id = delta.game_id;
+            END IF;
+            RETURN NULL;
+        END;
+        $$;
+
+        CREATE TRIGGER {table}_insert_{counter} AFTER INSERT ON {table}
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION {function}();
+
+        CREATE TRIGGER {table}_delete_{counter} AFTER DELETE ON {table}
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION {function}();
+
+        CREATE TRIGGER {table}_update_{counter} AFTER UPDATE ON {table}
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION {function}();
+    """
+
+
+def drop_counter_sql(table, counter):
+    return f"""
+        DROP TRIGGER {table}_insert_{counter} ON {table};
+        DROP TRIGGER {table}_delete_{counter} ON {table};
+        DROP TRIGGER {table}_update_{counter} ON {table};
+        DROP FUNCTION {table}_update_game_{counter}();
+    """
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0017_slugcounter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='nb_questions',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False, verbose_name='number of questions'),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='nb_players',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False, verbose_name='number of players'),
+        ),
+        migrations.RunSQL(
+            sql=counter_sql("app_question", "nb_questions"),
+            reverse_sql=drop_counter_sql("app_question", "nb_questions"),
+        ),
+        migrations.RunSQL(
+            sql=counter_sql("app_play", "nb_players"),
+            reverse_sql=drop_counter_sql("app_play", "nb_players"),
+        ),
+        migrations.RunSQL(
+            sql="""
+                UPDATE app_game SET
+                    nb_questions = (SELECT COUNT(*) FROM app_question WHERE app_question.game_id = app_game.id),
+                    nb_players = (SELECT COUNT(*) FROM app_play WHERE app_play.game_id = app_game.id);
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 5.2.7 on 2026-10-18 15:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0018_game_nb_questions_game_nb_players'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GameStatistics',
+            fields=[
+                ('game', models.OneToOneField(on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='statistics', serialize=False, to='app.game', verbose_name='game')),
+                ('nb_questions', models.PositiveIntegerField(verbose_name='number of questions')),
+                ('nb_players', models.PositiveIntegerField(verbose_name='number of players')),
+                ('average_score', models.FloatField(null=True, verbose_name='average score')),
+                ('completion_rate', models.FloatField(null=True, verbose_name='completion rate')),
+                ('last_played_at', models.DateTimeField(null=True, verbose_name='last played at')),
+            ],
+            options={
+                'verbose_name': 'game statistics',
+                'verbose_name_plural': 'games statistics',
+                'db_table': 'app_gamestatistics',
+                'managed': False,
+            },
+        ),
+        migrations.RunSQL(
+            sql="""
+                CREATE MATERIALIZED VIEW app_gamestatistics AS
+                WITH play_scores AS (
+                    SELECT
+                        app_play.id,
+                        app_play.game_id,
+                        app_play.updated_at,
+                        COALESCE(SUM(app_answer.points), 0) AS score,
+                        COUNT(app_entry.id) AS nb_entries,
+                        COUNT(app_entry.answer_id) AS nb_answered
+                    FROM app_play
+                    LEFT JOIN app_entry ON app_entry.play_id = app_play.id
+                    LEFT JOIN app_answer ON app_answer.id = app_entry.answer_id
+                    GROUP BY app_play.id
+                ),
+                game_plays AS (
+                    SELECT
+                        game_id,
+                        COUNT(*) AS nb_players,
+                        AVG(score)::double precision AS average_score,
+                        (SUM(nb_answered)::double precision / NULLIF(SUM(nb_entries), 0)) AS completion_rate,
+                        MAX(updated_at) AS last_played_at
+                    FROM play_scores
+                    GROUP BY game_id
+                ),
+                game_questions AS (
+                    SELECT game_id, COUNT(*) AS nb_questions
+                    FROM app_question
+                    GROUP BY game_id
+                )
+                SELECT
+                    app_game.id AS game_id,
+                    COALESCE(game_questions.nb_questions, 0) AS nb_questions,
+                    COALESCE(game_plays.nb_players, 0) AS nb_players,
+                    game_plays.average_score,
+                    game_plays.completion_rate,
+                    game_plays.last_played_at
+                FROM app_game
+                LEFT JOIN game_questions ON game_questions.game_id = app_game.id
+                LEFT JOIN game_plays ON game_plays.game_id = app_game.id;
+
+                -- Required by REFRESH MATERIALIZED VIEW CONCURRENTLY
+                CREATE UNIQUE INDEX app_gamestatistics_game_id_idx ON app_gamestatistics (game_id);
+            """,
+            reverse_sql="DROP MATERIALIZED VIEW app_gamestatistics;",
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0019_gamestatistics'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='player',
+            name='score',
+            field=models.PositiveSmallIntegerField(db_index=True, default=0, verbose_name='score'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0020_alter_player_score'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='play',
+            name='score',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='score'),
+        ),
+        # Score the existing plays without touching the players, whose scores were set until now
+        migrations.RunSQL(
+            sql="""
+                UPDATE app_play SET score = scores.score
+                FROM (
+                    SELECT app_entry.play_id, SUM(app_answer.points) AS score
+                    FROM app_entry
+                    JOIN app_answer ON app_answer.id = app_entry.answer_id
+                    GROUP BY app_entry.play_id
+                ) AS scores
+                WHERE app_play.id = scores.play_id;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
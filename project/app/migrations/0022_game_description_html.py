@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0021_play_score'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='description_html',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='description (HTML)'),
+        ),
+    ]
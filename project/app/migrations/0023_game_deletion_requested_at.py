@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 21:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0022_game_description_html'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='deletion_requested_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='deletion requested at'),
+        ),
+    ]
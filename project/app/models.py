@@ -1,14 +1,17 @@
+from collections import Counter
 from functools import partial
 from pathlib import Path
 from uuid import uuid4
 
 from django.conf import settings
 from django.db import models
+from django.utils.safestring import mark_safe
 from django.utils.timezone import now
 from django.utils.text import slugify
 from django.utils.translation import gettext_lazy as gettext
 
 from martor.models import MartorField
+from martor.utils import markdownify
 from mptt.models import MPTTModel, TreeForeignKey
 from polymorphic.models import PolymorphicModel
 
@@ -23,6 +26,8 @@ from .managers import (
     GenreManager,
     StatGameManager,
     EntryManager,
+    SlugCounterManager,
+    GameStatisticsManager,
 )
 from .mixins import (
     OrderingMixin,
@@ -69,6 +74,7 @@ class Player(TrackingMixin, PolymorphicModel):
     score = models.PositiveSmallIntegerField(
         verbose_name=gettext("score"),
         default=0,
+        db_index=True,
     )
 
     subscription_date = models.DateField(
@@ -254,6 +260,31 @@ class Genre(MPTTModel):
         order_insertion_by = ['name']
 
 
+class SlugCounter(models.Model):
+    """Last number allocated to the games sharing the same base slug."""
+
+    objects = SlugCounterManager()
+
+    base_slug = models.SlugField(
+        verbose_name=gettext("base slug"),
+        max_length=36,
+        unique=True,
+    )
+
+    last_number = models.PositiveIntegerField(
+        verbose_name=gettext("last number"),
+        default=1,
+    )
+
+    def __str__(self):
+        return f"{self.base_slug} ({self.last_number})"
+
+    class Meta:  # pylint: disable=too-few-public-methods
+
+        verbose_name = gettext("slug counter")
+        verbose_name_plural = gettext("slug counters")
+
+
 class Game(TrackingMixin, models.Model):
 
     objects = GameManager()
@@ -270,6 +301,14 @@ class Game(TrackingMixin, models.Model):
         verbose_name=gettext("description"),
     )
 
+    # Sanitized HTML rendering of the description, updated when the description is saved
+    description_html = models.TextField(
+        verbose_name=gettext("description (HTML)"),
+        blank=True,
+        default="",
+        editable=False,
+    )
+
     slug = models.SlugField(
         max_length=36,
         blank=False,
@@ -342,24 +381,100 @@ class Game(TrackingMixin, models.Model):
         default=False,
     )
 
+    # Maintained by database triggers on app_question and app_play (see migration 0018)
+    nb_questions = models.PositiveIntegerField(
+        verbose_name=gettext("number of questions"),
+        default=0,
+        db_index=True,
+        editable=False,
+    )
+
+    nb_players = models.PositiveIntegerField(
+        verbose_name=gettext("number of players"),
+        default=0,
+        db_index=True,
+        editable=False,
+    )
+
+    # Set when the game is hidden, waiting for its deletion by app.deletion
+    deletion_requested_at = models.DateTimeField(
+        verbose_name=gettext("deletion requested at"),
+        blank=True,
+        null=True,
+        editable=False,
+    )
+
+    COUNTER_FIELDS = ("nb_questions", "nb_players")
+
     @classmethod
-    def generate_slug(cls, name):
-        base_slug = slugify(name)
-        existing_suffixes = [
-            g.slug[len(base_slug) + 1:]
-            for g in Game.objects.filter(slug__startswith=base_slug).all()
-        ]
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Description as stored, to only render it again when it changes
+        instance._loaded_description = instance.__dict__.get("description")
+        return instance
+
+    def render_description(self, force: bool = False) -> bool:
+        """Render the description to HTML if it changed, and return whether it was rendered."""
+
+        if "description" not in self.__dict__:
+            # Deferred, so unchanged
+            return False
+        if not force and self.description_html and self.description == getattr(self, "_loaded_description", None):
+            return False
+        self.description_html = markdownify(self.description) if self.description else ""
+        return True
 
-        if len(existing_suffixes) == 0:
-            return base_slug
+    @property
+    def description_as_html(self):
+        # Games saved before description_html existed are rendered on the fly until render_descriptions is run
+        if not self.description_html and self.description:
+            return mark_safe(markdownify(self.description))
+        return mark_safe(self.description_html)
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if self.render_description() and update_fields is not None and "description" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "description_html"}
+
+        # Never write back counters that may have changed since this instance was loaded
+        if not self._state.adding and update_fields is None:
+            deferred_fields = self.get_deferred_fields()
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.COUNTER_FIELDS
+                and field.attname not in deferred_fields
+            ]
+        super().save(*args, **kwargs)
+        self._loaded_description = self.__dict__.get("description")
 
-        if "" in existing_suffixes:
-            existing_suffixes.remove("")
-        existing_suffixes.append(1)
+    @classmethod
+    def generate_slug(cls, name):
+        base_slug = slugify(name)
+        while True:
+            number = SlugCounter.objects.allocate(base_slug)
+            slug = base_slug if number == 1 else f"{base_slug}-{number}"
+            # Another base slug may already have produced it (e.g. "quiz-2" for a game named "Quiz 2")
+            if not Game.objects.filter(slug=slug).exists():
+                return slug
 
-        last_number = max(int(suffix) for suffix in existing_suffixes)
-        suffix = str(f"-{last_number + 1}")
-        return base_slug + suffix
+    @classmethod
+    def generate_slugs(cls, names) -> list[str]:
+        """Slugs of many new games, with two queries unless one of them is already taken."""
+
+        base_slugs = [slugify(name) for name in names]
+        quantities = Counter(base_slugs)
+        last_numbers = SlugCounter.objects.allocate_many(quantities)
+        next_numbers = {base_slug: last_numbers[base_slug] - quantity + 1 for base_slug, quantity in quantities.items()}
+        slugs = []
+        for base_slug in base_slugs:
+            number = next_numbers[base_slug]
+            next_numbers[base_slug] += 1
+            slugs.append(base_slug if number == 1 else f"{base_slug}-{number}")
+
+        taken = set(Game.objects.filter(slug__in=slugs).values_list("slug", flat=True))
+        return [cls.generate_slug(name) if slug in taken else slug for name, slug in zip(names, slugs)]
 
     def __str__(self):
         return self.name
@@ -449,6 +564,13 @@ class Answer(TrackingMixin, OrderingMixin, models.Model):
         default=0,
     )
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Points as stored, to rescore the plays when they change
+        instance._loaded_points = instance.__dict__.get("points")
+        return instance
+
     def __str__(self):
         return self.text[:47] + "[…]" if len(self.text) > 50 else self.text
 
@@ -505,6 +627,13 @@ class Play(TrackingMixin, models.Model):
         auto_now_add=True,
     )
 
+    # Maintained by app.scoring
+    score = models.PositiveIntegerField(
+        verbose_name=gettext("score"),
+        default=0,
+        editable=False,
+    )
+
     answer_set = models.ManyToManyField(
         verbose_name=gettext("entries"),
         related_name="play_set",
@@ -547,6 +676,53 @@ class StatGame(Game):
     #     return self.play.count()
 
 
+class GameStatistics(models.Model):
+    """Per-game statistics, read from a materialized view refreshed periodically (see migration 0019)."""
+
+    objects = GameStatisticsManager()
+
+    game = models.OneToOneField(
+        verbose_name=gettext("game"),
+        related_name="statistics",
+        to=Game,
+        primary_key=True,
+        on_delete=models.DO_NOTHING,
+    )
+
+    nb_questions = models.PositiveIntegerField(
+        verbose_name=gettext("number of questions"),
+    )
+
+    nb_players = models.PositiveIntegerField(
+        verbose_name=gettext("number of players"),
+    )
+
+    average_score = models.FloatField(
+        verbose_name=gettext("average score"),
+        null=True,
+    )
+
+    completion_rate = models.FloatField(
+        verbose_name=gettext("completion rate"),
+        null=True,
+    )
+
+    last_played_at = models.DateTimeField(
+        verbose_name=gettext("last played at"),
+        null=True,
+    )
+
+    def __str__(self):
+        return str(self.game)
+
+    class Meta:  # pylint: disable=too-few-public-methods
+
+        managed = False
+        db_table = "app_gamestatistics"
+        verbose_name = gettext("game statistics")
+        verbose_name_plural = gettext("games statistics")
+
+
 class Entry(models.Model):
 
     objects = EntryManager()
@@ -0,0 +1,154 @@
+"""Keyset (seek) pagination on (name, id), with opaque cursors.
+
+Unlike OFFSET pagination, fetching a page only costs an index seek, whatever its position in the catalogue.
+"""
+
+import base64
+import json
+from dataclasses import dataclass, field
+from typing import Any
+
+from django.db.models import Q
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+
+
+__all__ = [
+    "KeysetPage",
+    "keyset_paginate",
+    "akeyset_paginate",
+    "get_page_size",
+    "page_links",
+    "link_header",
+    "KeysetPagination",
+]
+
+
+PAGE_SIZE = 25
+MAX_PAGE_SIZE = 100
+
+NEXT = "n"
+PREVIOUS = "p"
+
+
+@dataclass
+class KeysetPage:
+    items: list[Any]
+    next_cursor: str | None = None
+    previous_cursor: str | None = None
+    links: dict[str, str] = field(default_factory=dict)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def encode_cursor(direction: str, item) -> str:
+    data = json.dumps([direction, item.name, item.pk], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[str, str, int] | None:
+    try:
+        data = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        direction, name, pk = json.loads(data)
+    except (ValueError, TypeError):
+        return None
+    if direction not in (NEXT, PREVIOUS) or not isinstance(name, str) or not isinstance(pk, int):
+        return None
+    return direction, name, pk
+
+
+def get_page_size(value, default: int = PAGE_SIZE) -> int:
+    try:
+        return max(1, min(int(value), MAX_PAGE_SIZE))
+    except (TypeError, ValueError):
+        return default
+
+
+def _seek(queryset, cursor: str | None):
+    """Filter and order the queryset from the position of the cursor, and tell whether it goes backwards."""
+
+    position = decode_cursor(cursor) if cursor else None
+    backwards = position is not None and position[0] == PREVIOUS
+
+    if position is None:
+        queryset = queryset.order_by("name", "pk")
+    elif backwards:
+        _, name, pk = position
+        queryset = queryset.filter(Q(name__lt=name) | Q(name=name, pk__lt=pk)).order_by("-name", "-pk")
+    else:
+        _, name, pk = position
+        queryset = queryset.filter(Q(name__gt=name) | Q(name=name, pk__gt=pk)).order_by("name", "pk")
+    return queryset, position, backwards
+
+
+def _page(items: list, position, backwards: bool, page_size: int) -> KeysetPage:
+    # One more row tells whether there is a page after this one
+    has_more = len(items) > page_size
+    items = items[:page_size]
+    if backwards:
+        items.reverse()
+
+    page = KeysetPage(items)
+    if not items:
+        return page
+    if has_more or backwards:
+        page.next_cursor = encode_cursor(NEXT, items[-1])
+    if position is not None and (has_more or not backwards):
+        page.previous_cursor = encode_cursor(PREVIOUS, items[0])
+    return page
+
+
+def keyset_paginate(queryset, cursor: str | None, page_size: int = PAGE_SIZE) -> KeysetPage:
+    """Return the page of the queryset located by the cursor (the first page without a valid cursor)."""
+
+    queryset, position, backwards = _seek(queryset, cursor)
+    return _page(list(queryset[:page_size + 1]), position, backwards, page_size)
+
+
+async def akeyset_paginate(queryset, cursor: str | None, page_size: int = PAGE_SIZE) -> KeysetPage:
+    """Async version of keyset_paginate."""
+
+    queryset, position, backwards = _seek(queryset, cursor)
+    return _page([item async for item in queryset[:page_size + 1]], position, backwards, page_size)
+
+
+def page_links(request, page: KeysetPage) -> dict[str, str]:
+    """Absolute URLs of the neighbour pages, keeping the other query parameters."""
+
+    links = {}
+    for rel, cursor in (("next", page.next_cursor), ("prev", page.previous_cursor)):
+        if cursor is not None:
+            params = request.GET.copy()
+            params["cursor"] = cursor
+            links[rel] = request.build_absolute_uri(f"{request.path}?{params.urlencode()}")
+    return links
+
+
+def link_header(links: dict[str, str]) -> str:
+    return ", ".join(f'<{url}>; rel="{rel}"' for rel, url in links.items())
+
+
+class KeysetPagination(BasePagination):
+    """DRF pagination keeping the list as the response body, the cursors being sent in a Link header."""
+
+    page_size = PAGE_SIZE
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page = keyset_paginate(
+            queryset,
+            request.query_params.get("cursor"),
+            get_page_size(request.query_params.get("limit"), self.page_size),
+        )
+        self.page.links = page_links(request, self.page)
+        return self.page.items
+
+    def get_paginated_response(self, data):
+        headers = {"Link": link_header(self.page.links)} if self.page.links else None
+        return Response(data, headers=headers)
+
+    def get_paginated_response_schema(self, schema):
+        return schema
@@ -27,3 +27,25 @@ class GameSchema(Schema):
 
 class MessageSchema(Schema):
     message: str
+
+
+class LeaderboardEntrySchema(Schema):
+    rank: int
+    player_id: int
+    username: str
+    first_name: str
+    last_name: str
+    score: int
+
+
+class PlayerRankSchema(Schema):
+    rank: int
+    score: int
+    around: list[LeaderboardEntrySchema]
+
+
+class GameCreationResultSchema(Schema):
+    name: str
+    status: int
+    id: int | None
+    errors: list[str]
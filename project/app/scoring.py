@@ -0,0 +1,217 @@
+"""Set-based scoring of plays.
+
+The score of a play is the sum of the points of the answers chosen in its entries. The score of a player is
+the sum of the scores of their plays: rescoring a play applies the difference between its new and old score
+to its player, so that any number of plays is rescored with a single statement.
+"""
+
+from functools import partial
+from itertools import batched
+
+from django.db import connection, transaction
+
+from . import leaderboard
+from .models import Entry, Play
+
+
+__all__ = [
+    "rescore_plays",
+    "rescore_answer",
+    "rescore_answer_plays",
+    "discard_plays",
+    "rescore_game",
+    "rescore_all",
+    "recompute_player_scores",
+]
+
+
+CHUNK_SIZE = 1000
+
+# Above this number of entries, plays are rescored by a Celery job instead of within the request
+RESCORE_INLINE_LIMIT = 5000
+
+# Player.score is a PositiveSmallIntegerField
+MAX_PLAYER_SCORE = 32767
+
+RESCORE_SQL = f"""
+    WITH scores AS (
+        SELECT app_play.id, COALESCE(SUM(app_answer.points), 0) AS score
+        FROM app_play
+        LEFT JOIN app_entry ON app_entry.play_id = app_play.id
+        LEFT JOIN app_answer ON app_answer.id = app_entry.answer_id
+        WHERE app_play.id = ANY(%s)
+        GROUP BY app_play.id
+    ),
+    changed_plays AS (
+        -- previous_play is read from the snapshot taken before the update: it holds the old score
+        UPDATE app_play SET score = scores.score
+        FROM scores
+        JOIN app_play AS previous_play ON previous_play.id = scores.id
+        WHERE app_play.id = scores.id AND app_play.score <> scores.score
+        RETURNING app_play.player_id, scores.score - previous_play.score AS delta
+    ),
+    deltas AS (
+        SELECT player_id, SUM(delta) AS delta
+        FROM changed_plays
+        GROUP BY player_id
+    )
+    UPDATE app_player
+    SET score = GREATEST(0, LEAST({MAX_PLAYER_SCORE}, app_player.score + deltas.delta))
+    FROM deltas
+    WHERE app_player.id = deltas.player_id
+    RETURNING app_player.id, app_player.score
+"""
+
+ANSWER_DELTA_SQL = f"""
+    WITH changed_plays AS (
+        UPDATE app_play SET score = app_play.score + %(delta)s * entries.nb_entries
+        FROM (
+            SELECT play_id, COUNT(*) AS nb_entries
+            FROM app_entry
+            WHERE answer_id = %(answer_id)s
+            GROUP BY play_id
+        ) AS entries
+        WHERE app_play.id = entries.play_id
+        RETURNING app_play.player_id, %(delta)s * entries.nb_entries AS delta
+    ),
+    deltas AS (
+        SELECT player_id, SUM(delta) AS delta
+        FROM changed_plays
+        GROUP BY player_id
+    )
+    UPDATE app_player
+    SET score = GREATEST(0, LEAST({MAX_PLAYER_SCORE}, app_player.score + deltas.delta))
+    FROM deltas
+    WHERE app_player.id = deltas.player_id
+    RETURNING app_player.id, app_player.score
+"""
+
+DISCARD_SQL = """
+    WITH deltas AS (
+        SELECT player_id, SUM(score) AS delta
+        FROM app_play
+        WHERE id = ANY(%s) AND score > 0
+        GROUP BY player_id
+    )
+    UPDATE app_player
+    SET score = GREATEST(0, app_player.score - deltas.delta)
+    FROM deltas
+    WHERE app_player.id = deltas.player_id
+    RETURNING app_player.id, app_player.score
+"""
+
+RECOMPUTE_PLAYERS_SQL = f"""
+    UPDATE app_player
+    SET score = LEAST({MAX_PLAYER_SCORE}, COALESCE(totals.score, 0))
+    FROM app_player AS player
+    LEFT JOIN (
+        SELECT player_id, SUM(score) AS score FROM app_play GROUP BY player_id
+    ) AS totals ON totals.player_id = player.id
+    WHERE app_player.id = player.id AND app_player.score <> LEAST({MAX_PLAYER_SCORE}, COALESCE(totals.score, 0))
+"""
+
+
+def _sync_leaderboards(play_ids, player_scores: dict[int, int]) -> None:
+    leaderboard.update_player_scores(player_scores)
+    leaderboard.update_play_scores(play_ids)
+
+
+def rescore_plays(play_ids) -> dict[int, int]:
+    """Recompute the score of the plays and apply the differences to their players, in one statement.
+
+    Idempotent: rescoring plays whose entries did not change updates nothing.
+    Return the new score of every player whose score changed.
+    """
+
+    play_ids = list(play_ids)
+    if not play_ids:
+        return {}
+
+    with connection.cursor() as cursor:
+        cursor.execute(RESCORE_SQL, [play_ids])
+        player_scores = dict(cursor.fetchall())
+
+    if player_scores:
+        transaction.on_commit(partial(_sync_leaderboards, play_ids, player_scores))
+    return player_scores
+
+
+def discard_plays(play_ids) -> dict[int, int]:
+    """Remove the scores of plays about to be deleted from their players and return the new player scores."""
+
+    play_ids = list(play_ids)
+    if not play_ids:
+        return {}
+
+    with connection.cursor() as cursor:
+        cursor.execute(DISCARD_SQL, [play_ids])
+        player_scores = dict(cursor.fetchall())
+
+    if player_scores:
+        transaction.on_commit(partial(leaderboard.update_player_scores, player_scores))
+    return player_scores
+
+
+def rescore_answer(answer_id: int, delta: int) -> None:
+    """Apply a change of the points of an answer to the plays that chose it, and to their players.
+
+    Popular answers are rescored after the commit by the rescore_answer_plays Celery task, by chunks.
+    """
+
+    if delta == 0:
+        return
+
+    if Entry.objects.filter(answer_id=answer_id).count() > RESCORE_INLINE_LIMIT:
+        from .tasks import rescore_answer_plays  # pylint: disable=import-outside-toplevel
+
+        transaction.on_commit(partial(rescore_answer_plays.delay, answer_id))
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute(ANSWER_DELTA_SQL, {"answer_id": answer_id, "delta": delta})
+        player_scores = dict(cursor.fetchall())
+
+    if player_scores:
+        play_ids = Entry.objects.filter(answer_id=answer_id).values("play_id")
+        transaction.on_commit(partial(_sync_leaderboards, play_ids, player_scores))
+
+
+def rescore_answer_plays(answer_id: int, chunk_size: int = CHUNK_SIZE, progress=None) -> int:
+    """Rescore every play which chose an answer by chunks and return the number of plays."""
+
+    return _rescore_by_chunks(Play.objects.filter(entry_set__answer_id=answer_id).distinct(), chunk_size, progress)
+
+
+def _rescore_by_chunks(queryset, chunk_size: int, progress=None) -> int:
+    nb_plays = 0
+    for chunk in batched(queryset.order_by("pk").values_list("pk", flat=True).iterator(chunk_size=chunk_size), chunk_size):
+        # One short transaction per chunk: the rows of a chunk are only locked while it is rescored
+        with transaction.atomic():
+            rescore_plays(chunk)
+        nb_plays += len(chunk)
+        if progress is not None:
+            progress(nb_plays)
+    return nb_plays
+
+
+def rescore_game(game_id: int, chunk_size: int = CHUNK_SIZE, progress=None) -> int:
+    """Rescore every play of a game by chunks and return the number of plays."""
+
+    return _rescore_by_chunks(Play.objects.filter(game_id=game_id), chunk_size, progress)
+
+
+def rescore_all(chunk_size: int = CHUNK_SIZE, progress=None) -> int:
+    """Rescore every play of the database by chunks and return the number of plays."""
+
+    return _rescore_by_chunks(Play.objects.all(), chunk_size, progress)
+
+
+def recompute_player_scores() -> int:
+    """Set every player score to the sum of the scores of their plays and return the number of changes.
+
+    Needed once for players whose score was set by hand before plays were scored.
+    """
+
+    with connection.cursor() as cursor:
+        cursor.execute(RECOMPUTE_PLAYERS_SQL)
+        return cursor.rowcount
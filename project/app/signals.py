@@ -1,15 +1,20 @@
-"""Signaux liés à l'application."""
+"""Signaux liés à l'application.
 
+Les signaux de Django ne font qu'émettre des événements (voir app.events), traités par lots.
+"""
+
+from collections import defaultdict
 from typing import Any
 
-from django.apps import AppConfig
+from django.apps import AppConfig, apps
 from django.db.models.signals import (
     pre_save,
     post_save,
     post_delete,
 )
-from django.core.cache import cache
-from django.dispatch import receiver, Signal
+from django.db.models import F, Max, OuterRef, PositiveSmallIntegerField, QuerySet, Subquery
+from django.db.models.functions import Coalesce, Greatest, Least
+from django.dispatch import receiver
 from django.utils.translation import gettext_lazy as gettext
 
 from .models import (
@@ -19,16 +24,18 @@ from .models import (
     Play,
     Entry,
     Player,
-    Guest,
-    Subscriber,
-    TeamMate,
-    GameMaster,
 )
-from .tasks import create_avatar
+from . import events, leaderboard
+from .caching import bump_model_versions
+from .events import emit_model_event
+from .scoring import rescore_answer
+from .tasks import queue_avatar
 
 
 __all__ = [
     "game_create_slug",
+    "emit_saved_events",
+    "emit_deleted_events",
 ]
 
 
@@ -46,158 +53,222 @@ def game_create_slug(
 
     instance.slug = Game.generate_slug(instance.name)
 
-    if (update_fields is not None) and ("user" not in update_fields):
+    if (update_fields is not None) and ("slug" not in update_fields):
         update_fields.append("slug")
 
 
-@receiver(post_save, sender=Game, dispatch_uid="game_create_first_questions")
-def game_create_first_questions(
+@receiver(pre_save, sender=Answer, dispatch_uid="answer_remember_points")
+def answer_remember_points(
     sender: AppConfig,
-    instance: Game,
-    created: bool,
+    instance: Answer,
     raw: bool,
     using: str,
     update_fields: list[str] | None,
     **_: dict[str, Any],
 ) -> None:
-    if raw or not created:
+    # Instances loaded from the database already know their points (see Answer.from_db)
+    if raw or instance._state.adding or hasattr(instance, "_loaded_points"):
         return
 
+    instance._loaded_points = Answer.objects.filter(pk=instance.pk).values_list("points", flat=True).first()
+
+
+@receiver(post_save, dispatch_uid="emit_saved_events")
+def emit_saved_events(
+    sender: AppConfig,
+    instance: Any,
+    created: bool,
+    raw: bool,
+    update_fields: frozenset[str] | None = None,
+    **_: dict[str, Any],
+) -> None:
+    if raw or sender._meta.app_label != "app":
+        return
+
+    # The fields saved, None for every field: read by the handlers only accepting some changes
+    instance._update_fields = update_fields
+    emit_model_event(instance, "created" if created else "updated")
+
+
+# Connected only to the models having handlers (see connect_deleted_events), so that Django can delete the
+# others, like the entries of a deleted game, without loading them
+def emit_deleted_events(
+    sender: AppConfig,
+    instance: Any,
+    origin: Any = None,
+    **_: dict[str, Any],
+) -> None:
+    # The object, or queryset, whose deletion was requested: differs from the instance on cascades
+    instance._deletion_origin = origin
+    emit_model_event(instance, "deleted")
+
+
+@events.on("game.created", phase=events.IMMEDIATE)
+def game_create_first_questions(games: list[Game]) -> None:
     questions = Question.objects.bulk_create(
         [
             Question(
-                game=instance,
+                game=game,
                 text=gettext("Question {}".format(i)),
                 points=0,
             )
+            for game in games
             for i in range(2)
         ]
     )
-    for question in questions:
-        post_save.send(
-            sender=Question,
-            instance=question,
-            created=True,
-            raw=False,
-            using=using,
-            update_fields=None,
-        )
-
-
-@receiver(post_save, sender=Question, dispatch_uid="question_create_first_answers")
-def question_create_first_answers(
-    sender: AppConfig,
-    instance: Question,
-    created: bool,
-    raw: bool,
-    using: str,
-    update_fields: list[str] | None,
-    **_: dict[str, Any],
-) -> None:
-    if raw or not created:
-        return
+    events.emit_many("question.created", questions)
+
 
+@events.on("question.created", phase=events.IMMEDIATE)
+def question_create_first_answers(questions: list[Question]) -> None:
     Answer.objects.bulk_create(
         [
             Answer(
-                question=instance,
+                question=question,
                 text=gettext("Answer {}".format(i)),
                 points=0,
             )
+            for question in questions
             for i in range(3)
         ]
     )
 
 
-@receiver(post_save, sender=Answer, dispatch_uid="answer_points_consistency_on_save")
-def answer_points_consistency_on_save(
-    sender: AppConfig,
-    instance: Answer,
-    created: bool,
-    raw: bool,
-    using: str,
-    update_fields: list[str] | None,
-    **_: dict[str, Any],
-) -> None:
-    if raw:
-        return
+@events.on("answer.created", "answer.updated", phase=events.IMMEDIATE)
+def answer_points_consistency_on_save(answers: list[Answer]) -> None:
+    # Questions are worth at least as much as their best answer: one statement for every question. No
+    # "question.updated" is needed, the caches depending on the questions also depend on the answers.
+    best_points = (
+        Answer.objects.filter(question_id=OuterRef("pk"))
+        .order_by()
+        .values("question_id")
+        .annotate(best_points=Max("points"))
+        .values("best_points")
+    )
+    Question.objects.filter(pk__in={answer.question_id for answer in answers}).update(
+        points=Greatest(F("points"), Coalesce(Subquery(best_points), 0, output_field=PositiveSmallIntegerField())),
+    )
 
-    if int(instance.points) > int(instance.question.points):
-        instance.question.points = int(instance.points)
-        instance.question.save(update_fields=["points"])
 
+@events.on("answer.updated", phase=events.IMMEDIATE)
+def answer_rescore_plays(answers: list[Answer]) -> None:
+    for answer in answers:
+        previous_points = getattr(answer, "_loaded_points", None)
+        answer._loaded_points = answer.points
+        if previous_points is not None:
+            rescore_answer(answer.pk, int(answer.points) - previous_points)
 
-@receiver(post_delete, sender=Answer, dispatch_uid="answer_points_consistency_on_delete")
-def answer_points_consistency_on_delete(
-    sender: AppConfig,
-    instance: Answer,
-    using: str,
-    **_: dict[str, Any]
-) -> None:
 
-    other_answers = instance.question.answer_set.exclude(pk=instance.pk).all()
+def _deleted_directly(instance) -> bool:
+    origin = getattr(instance, "_deletion_origin", None)
+    if origin is None:
+        return True
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return issubclass(origin_model, type(instance))
+
 
-    if len(other_answers) == 0:
-        instance.question.points = 0
-        instance.question.save(update_fields=["points"])
+@events.on("answer.deleted", phase=events.IMMEDIATE)
+def answer_points_consistency_on_delete(answers: list[Answer]) -> None:
+    # Answers deleted along with their question or their game: nothing left to keep consistent
+    question_ids = {answer.question_id for answer in answers if _deleted_directly(answer)}
+    if not question_ids:
         return
 
-    if (nb_points := max(answer.points for answer in other_answers)) < instance.question.points:
-        instance.question.points = nb_points
-        instance.question.save(update_fields=["points"])
+    # Questions are worth at most as much as their best remaining answer: one statement for every question
+    best_points = (
+        Answer.objects.filter(question_id=OuterRef("pk"))
+        .order_by()
+        .values("question_id")
+        .annotate(best_points=Max("points"))
+        .values("best_points")
+    )
+    Question.objects.filter(pk__in=question_ids).update(
+        points=Least(F("points"), Coalesce(Subquery(best_points), 0, output_field=PositiveSmallIntegerField())),
+    )
 
 
-@receiver(post_save, sender=Play, dispatch_uid="question_create_entries_when_creating_play")
-def question_create_entries_when_creating_play(
-    sender: AppConfig,
-    instance: Question,
-    created: bool,
-    raw: bool,
-    using: str,
-    update_fields: list[str] | None,
-    **_: dict[str, Any],
-) -> None:
-    if raw or not created:
-        return
+@events.on("play.created", phase=events.IMMEDIATE)
+def question_create_entries_when_creating_play(plays: list[Play]) -> None:
+    questions = defaultdict(list)
+    for question_id, game_id in Question.objects.filter(
+        game_id__in={play.game_id for play in plays}
+    ).order_by("game_id", "order", "pk").values_list("pk", "game_id"):
+        questions[game_id].append(question_id)
 
     Entry.objects.bulk_create(
         [
-            Entry(play=instance, question=question)
-            for question in instance.game.question_set.all()
+            Entry(play=play, question_id=question_id)
+            for play in plays
+            for question_id in questions[play.game_id]
         ]
     )
 
 
-@receiver(post_save, sender=Player)
-@receiver(post_save, sender=Guest)
-@receiver(post_save, sender=Subscriber)
-@receiver(post_save, sender=TeamMate)
-@receiver(post_save, sender=GameMaster)
-def player_post_save_create_avatar(
-        sender: AppConfig,
-        instance: Player,
-        created: bool,
-        **kwargs
-):
-    if not instance.avatar:
-        create_avatar.delay(instance.pk)
-
-
-@receiver(post_save, sender=Player)
-@receiver(post_save, sender=Guest)
-@receiver(post_save, sender=Subscriber)
-@receiver(post_save, sender=TeamMate)
-@receiver(post_save, sender=GameMaster)
-@receiver(post_save, sender=Game)
-@receiver(post_delete, sender=Player)
-@receiver(post_delete, sender=Guest)
-@receiver(post_delete, sender=Subscriber)
-@receiver(post_delete, sender=TeamMate)
-@receiver(post_delete, sender=GameMaster)
-@receiver(post_delete, sender=Game)
-def invalidate_home_view_cache(
-    sender: AppConfig,
-    instance: Player | Game,
-    **kwargs
-):
-    cache.clear()
+@events.on("player.created", "player.updated")
+def player_create_avatar(players: list[Player]) -> None:
+    for player in players:
+        if not player.avatar:
+            queue_avatar(player.pk)
+
+
+@events.on("player.created", "player.updated", "player.deleted")
+def invalidate_player_caches(players: list[Player]) -> None:
+    # Once per transaction, whatever the number of players
+    bump_model_versions(Player)
+
+
+@events.on("game.created", "game.updated", "game.deleted")
+def invalidate_game_caches(games: list[Game]) -> None:
+    bump_model_versions(Game)
+
+
+@events.on(
+    "question.created",
+    "question.updated",
+    "question.deleted",
+    "answer.created",
+    "answer.updated",
+    "answer.deleted",
+)
+def invalidate_question_caches(instances: list[Question | Answer]) -> None:
+    bump_model_versions(*{type(instance) for instance in instances})
+
+
+def _score_saved(player: Player) -> bool:
+    update_fields = getattr(player, "_update_fields", None)
+    return update_fields is None or "score" in update_fields
+
+
+@events.on("player.created", "player.updated", accepts=_score_saved)
+def player_update_leaderboard(players: list[Player]) -> None:
+    leaderboard.update_player_scores({player.pk: player.score for player in players})
+
+
+@events.on("player.deleted")
+def player_remove_from_leaderboard(players: list[Player]) -> None:
+    leaderboard.remove_players([player.pk for player in players])
+
+
+@events.on("play.deleted")
+def play_remove_from_leaderboard(plays: list[Play]) -> None:
+    player_ids = defaultdict(list)
+    for play in plays:
+        player_ids[play.game_id].append(play.player_id)
+    for game_id, game_player_ids in player_ids.items():
+        leaderboard.remove_game_players(game_id, game_player_ids)
+
+
+def connect_deleted_events() -> None:
+    for model in apps.get_app_config("app").get_models():
+        if any(
+            events.has_handlers(f"{event_model._meta.model_name}.deleted")
+            for event_model in (model, *model._meta.get_parent_list())
+        ):
+            post_delete.connect(
+                emit_deleted_events,
+                sender=model,
+                dispatch_uid=f"emit_deleted_events_{model._meta.label_lower}",
+            )
+
+
+connect_deleted_events()
@@ -0,0 +1,45 @@
+"""Statistics displayed on the home page."""
+
+from . import leaderboard
+from .caching import store_fresh_value, get_stale_while_revalidate
+from .models import Player, Game
+
+
+__all__ = [
+    "compute_home_statistics",
+    "refresh_home_statistics",
+    "get_home_statistics",
+]
+
+
+HOME_STATISTICS_KEY = "home_statistics"
+HOME_STATISTICS_FRESH_FOR = 60
+
+
+def compute_home_statistics() -> dict:
+    """Compute the statistics with plain values, so that they can be cached as is."""
+
+    return {
+        "nb_players": Player.objects.non_polymorphic().count(),
+        # Same attributes as a Player for the template
+        "best_players": [
+            {
+                "user": {"first_name": player["first_name"], "last_name": player["last_name"]},
+                "score": player["score"],
+            }
+            for player in leaderboard.top(5)
+        ],
+        "nb_games": Game.objects.visible().count(),
+    }
+
+
+def refresh_home_statistics() -> dict:
+    return store_fresh_value(HOME_STATISTICS_KEY, compute_home_statistics(), HOME_STATISTICS_FRESH_FOR)
+
+
+def get_home_statistics() -> dict:
+    return get_stale_while_revalidate(
+        HOME_STATISTICS_KEY,
+        compute_home_statistics,
+        fresh_for=HOME_STATISTICS_FRESH_FOR,
+    )
@@ -1,62 +1,112 @@
-from random import choice
-from itertools import repeat
-from io import BytesIO
-from PIL import Image, ImageDraw, ImageFont
+from django.db.models import Q
 
 from celery import shared_task
 
-from .models import Player, Game, Play
+from .avatars import (
+    AVATAR_BATCH_DELAY,
+    get_initials,
+    store_avatar,
+    mark_avatar_pending,
+    pop_pending_avatars,
+    clear_avatar_schedule,
+)
+from .models import Player, Play, GameStatistics
+from . import deletion, generation, scoring
+from .statistics import refresh_home_statistics
+
+
+@shared_task
+def create_avatars_batch(instance_pks: list[int]):
+    """Render the avatars of many players and store them with a single UPDATE.
+
+    No post_save signal is sent, so that storing an avatar neither queues another one nor invalidates caches.
+    """
+
+    players = list(
+        Player.objects
+        .non_polymorphic()
+        .filter(pk__in=instance_pks)
+        .filter(Q(avatar__isnull=True) | Q(avatar=""))
+    )
+    for player in players:
+        player.avatar.name = store_avatar(get_initials(player.user))
+
+    Player.objects.non_polymorphic().bulk_update(players, ["avatar"])
+    return len(players)
+
+
+@shared_task
+def create_pending_avatars():
+    clear_avatar_schedule()
+    nb_avatars = 0
+    while instance_pks := pop_pending_avatars():
+        nb_avatars += create_avatars_batch(instance_pks)
+    return nb_avatars
 
 
 @shared_task
 def create_avatar(instance_pk: int):
-    # Get the Player object
-    instance = Player.objects.get(pk=instance_pk)
-
-    # Set image size
-    img_size = (128, 128)
-    # Set random dark background color (font is white)
-    bgcolor = "#" + "".join((f() for f in repeat(lambda: choice([str(x) for x in range(8)]), 3)))
-
-    # Get user initials
-    user = instance.user
-    match user.first_name, user.last_name, user.username:
-        case first_name, last_name, _ if first_name and last_name:
-            initials = first_name[0] + last_name[0]
-        case first_name, "" | None, _ if first_name:
-            initials = first_name[:2]
-        case "" | None, last_name, _ if last_name:
-            initials = last_name[:2]
-        case _:
-            initials = user.username[:2]
-
-    # Create the image
-    img = Image.new('RGB', img_size, color=bgcolor)
-    draw = ImageDraw.Draw(img)
-
-    # Set the font and boundaries
-    font = ImageFont.load_default(size=64)
-
-    # Get the text position (up left corner)
-    bounding_box = font.getbbox(initials)
-    text_width = bounding_box[2] - bounding_box[0]
-    text_height = bounding_box[3] - bounding_box[1]
-    position = ((img_size[0] - text_width) / 2, (img_size[1] - text_height) / 2)
-
-    # Write initials
-    draw.text(position, initials, fill="white", font=font)
-
-    # Save the avatar
-    with BytesIO() as image_io:
-        img.save(image_io, format='PNG')
-        image_io.seek(0)
-        instance.avatar.save(f"generated_avatar_{initials}.png", image_io)
-    instance.save()
+    return create_avatars_batch([instance_pk])
+
+
+def queue_avatar(instance_pk: int) -> None:
+    """Queue the avatar creation of a player, coalesced with the others queued at the same time."""
+
+    if mark_avatar_pending(instance_pk):
+        create_pending_avatars.apply_async(countdown=AVATAR_BATCH_DELAY)
 
 
 @shared_task
 def stats():
-    nb_players = Player.objects.count()
-    nb_games = Game.objects.count()
+    # Also keeps the home page statistics fresh when scheduled with celery beat
+    statistics = refresh_home_statistics()
+    nb_players = statistics["nb_players"]
+    nb_games = statistics["nb_games"]
     nb_plays = Play.objects.count()
     return nb_players, nb_games, nb_plays
+
+
+@shared_task
+def refresh_game_statistics():
+    GameStatistics.objects.refresh()
+
+
+@shared_task
+def rescore_answer_plays(answer_id: int):
+    return scoring.rescore_answer_plays(answer_id)
+
+
+@shared_task
+def delete_game(game_id: int):
+    return deletion.delete_game(game_id)
+
+
+@shared_task(bind=True)
+def generate_questions_answers(
+    self,
+    game_id: int,
+    num_questions: int,
+    question_prefix: str,
+    num_answers_per_question: int,
+    answer_prefix: str,
+):
+    task_id = self.request.id
+
+    def progress(nb_questions):
+        generation.set_progress(task_id, generation.RUNNING, nb_questions, num_questions)
+
+    progress(0)
+    try:
+        result = generation.generate_questions_answers(
+            game_id,
+            num_questions,
+            question_prefix,
+            num_answers_per_question,
+            answer_prefix,
+            progress=progress,
+        )
+    except Exception:
+        generation.set_progress(task_id, generation.FAILED, generation.get_progress(task_id)["done"], num_questions)
+        raise
+    generation.set_progress(task_id, generation.DONE, num_questions, num_questions)
+    return result
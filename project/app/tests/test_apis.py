@@ -1,6 +1,9 @@
 # import json
 from datetime import timedelta
 
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from rest_framework.test import APITestCase
 from rest_framework import status
 
@@ -81,7 +84,7 @@ class DRFGamesAPITest(GamesAPITest):
                     for question in game.question_set.all()
                 ],
             }
-            for game in Game.objects.all()
+            for game in Game.objects.full_tree()
         ]
 
 
@@ -127,5 +130,100 @@ class NinjaGamesAPITest(GamesAPITest):
                     for question in game.question_set.all()
                 ],
             }
-            for game in Game.objects.all()
+            for game in Game.objects.full_tree()
         ]
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class AsyncNinjaGamesAPITest(NinjaGamesAPITest):
+
+    url_prefix = "ninja/async"
+
+    def test_detail_is_cached_until_a_change(self):
+        game = Game.objects.first()
+        url = f"/api-{self.url_prefix}/games/{game.pk}"
+
+        self.assertEqual(self.client.get(url).json()["name"], game.name)
+        with self.assertNumQueries(0):
+            self.client.get(url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            game.name = "Renamed"
+            game.save()
+        self.assertEqual(self.client.get(url).json()["name"], "Renamed")
+
+
+class NinjaGameCloneTest(APITestCase):
+
+    def setUp(self):
+        self.game = Game.objects.create(name="Source")
+
+    def test_clone(self):
+        response = self.client.post(f"/api-ninja/games/{self.game.pk}/clone")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.json()["name"], "Source (copy)")
+
+        response = self.client.post(f"/api-ninja/games/{self.game.pk}/clone?name=Named")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.json()["name"], "Named")
+
+    def test_invalid_name(self):
+        response = self.client.post(f"/api-ninja/games/{self.game.pk}/clone?name=Source")
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+        response = self.client.post(f"/api-ninja/games/{self.game.pk}/clone?name={'x' * 33}")
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Game.objects.count(), 1)
+
+
+class NinjaGameBatchCreationTest(APITestCase):
+
+    @staticmethod
+    def game_data(name, nb_questions=3):
+        return {
+            "name": name,
+            "duration": None,
+            "status": "draft",
+            "level": None,
+            "question_set": [
+                {
+                    "text": f"Question {question}",
+                    "points": 1,
+                    "order": question,
+                    "answer_set": [
+                        {"text": f"Answer {answer}", "points": answer, "order": answer}
+                        for answer in range(3)
+                    ],
+                }
+                for question in range(nb_questions)
+            ],
+        }
+
+    def test_create_games_in_batch(self):
+        Game.objects.create(name="Existing")
+        invalid = self.game_data("Invalid")
+        invalid["question_set"][1]["text"] = "Question 0"
+
+        with CaptureQueriesContext(connection) as small_batch:
+            response = self.client.post("/api-ninja/items/batch", [self.game_data("Small", 1)], format="json")
+        self.assertEqual([result["status"] for result in response.json()], [201])
+        with CaptureQueriesContext(connection) as large_batch:
+            response = self.client.post(
+                "/api-ninja/items/batch",
+                [self.game_data("First", 20), self.game_data("Existing"), invalid, self.game_data("Second")],
+                format="json",
+            )
+        self.assertEqual(len(large_batch), len(small_batch))
+        # The existing names, the savepoint, the slug counters, the taken slugs, the games, the questions, the
+        # answers and the savepoint release
+        self.assertEqual(len(large_batch), 8)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.json()
+        self.assertEqual([result["status"] for result in results], [201, 422, 422, 201])
+        first = Game.objects.get(pk=results[0]["id"])
+        self.assertEqual(first.question_set.count(), 20)
+        # Worth at least as much as their best answer
+        self.assertEqual(set(first.question_set.values_list("points", flat=True)), {2})
+        self.assertEqual(Game.objects.get(pk=results[3]["id"]).question_set.count(), 3)
+        self.assertFalse(Game.objects.filter(name="Invalid").exists())
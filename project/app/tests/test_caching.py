@@ -0,0 +1,86 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from ..caching import (
+    register_dependencies,
+    bump_model_versions,
+    versioned_key_prefix,
+    store_fresh_value,
+    get_stale_while_revalidate,
+)
+from ..models import Player, Guest, Game, Genre
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class CacheDependenciesTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        register_dependencies("test_players", Player)
+        register_dependencies("test_games", Game)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_prefix_is_stable_without_changes(self):
+        self.assertEqual(versioned_key_prefix("test_players"), versioned_key_prefix("test_players"))
+
+    def test_prefix_without_dependencies(self):
+        self.assertEqual(versioned_key_prefix("test_unknown"), "test_unknown")
+
+    def test_bump_changes_only_dependent_prefixes(self):
+        players_prefix = versioned_key_prefix("test_players")
+        games_prefix = versioned_key_prefix("test_games")
+
+        bump_model_versions(Game)
+
+        self.assertEqual(versioned_key_prefix("test_players"), players_prefix)
+        self.assertNotEqual(versioned_key_prefix("test_games"), games_prefix)
+
+    def test_bump_subclass_invalidates_parent(self):
+        players_prefix = versioned_key_prefix("test_players")
+
+        bump_model_versions(Guest)
+
+        self.assertNotEqual(versioned_key_prefix("test_players"), players_prefix)
+
+    def test_other_keys_are_kept(self):
+        cache.set("unrelated", 42)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Game.objects.create(name="cached", genre=Genre.objects.create(name="cached"))
+
+        self.assertEqual(cache.get("unrelated"), 42)
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class StaleWhileRevalidateTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_fresh_value_is_not_recomputed(self):
+        store_fresh_value("stats", 1, fresh_for=60)
+        compute = mock.Mock(return_value=2)
+
+        self.assertEqual(get_stale_while_revalidate("stats", compute, fresh_for=60), 1)
+        compute.assert_not_called()
+
+    def test_stale_value_is_recomputed_once(self):
+        store_fresh_value("stats", 1, fresh_for=-1)
+        compute = mock.Mock(return_value=2)
+
+        self.assertEqual(get_stale_while_revalidate("stats", compute, fresh_for=60), 2)
+        self.assertEqual(get_stale_while_revalidate("stats", compute, fresh_for=60), 2)
+        compute.assert_called_once()
+
+    def test_stale_value_is_served_while_locked(self):
+        store_fresh_value("stats", 1, fresh_for=-1)
+        cache.add("stats:lock", 1)
+        compute = mock.Mock(return_value=2)
+
+        self.assertEqual(get_stale_while_revalidate("stats", compute, fresh_for=60), 1)
+        compute.assert_not_called()
@@ -1,20 +1,29 @@
-from io import StringIO
+import csv
+import gzip
+from io import BytesIO, StringIO
 from pathlib import Path
+from tempfile import TemporaryDirectory
+from types import SimpleNamespace
 
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
 from django.core.management import call_command
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase
+from PIL import Image
 
-from ..factories import GameFactory
-from ..models import Genre
+from ..avatars import get_initials, render_avatar
+from ..importers import open_csv, read_rows, shard_file
+from ..factories import GameFactory, GuestFactory
+from ..models import Answer, Game, Genre, Player, Question
 
 file_content ="""\
 "game__name","game__description","game__duration","game__status","game__level","game__genre","question__text","question__points","question__order","answer__text","answer__points","answer__order"
-"{game.name}","{game.description}","","{game.status}","{game.level}","{game.genre.name}","Question 0","0","0","Answer 2","0","0"
-"{game.name}","{game.description}","","{game.status}","{game.level}","{game.genre.name}","Question 0","0","0","Answer 1","0","0"
 "{game.name}","{game.description}","","{game.status}","{game.level}","{game.genre.name}","Question 0","0","0","Answer 0","0","0"
-"{game.name}","{game.description}","","{game.status}","{game.level}","{game.genre.name}","Question 1","0","0","Answer 2","0","0"
-"{game.name}","{game.description}","","{game.status}","{game.level}","{game.genre.name}","Question 1","0","0","Answer 1","0","0"
+"{game.name}","{game.description}","","{game.status}","{game.level}","{game.genre.name}","Question 0","0","0","Answer 1","0","0"
+"{game.name}","{game.description}","","{game.status}","{game.level}","{game.genre.name}","Question 0","0","0","Answer 2","0","0"
 "{game.name}","{game.description}","","{game.status}","{game.level}","{game.genre.name}","Question 1","0","0","Answer 0","0","0"
+"{game.name}","{game.description}","","{game.status}","{game.level}","{game.genre.name}","Question 1","0","0","Answer 1","0","0"
+"{game.name}","{game.description}","","{game.status}","{game.level}","{game.genre.name}","Question 1","0","0","Answer 2","0","0"
 """
 
 
@@ -44,8 +53,233 @@ class AppCommandTest(TestCase):
         with open(self.path) as f:
             self.assertEqual(f.read(), file_content.format(game=self.game))
 
+    def test_export_games_stream_to_stdout(self):
+        out = StringIO()
+        err = StringIO()
+        call_command(
+            "export_games",
+            game_name=self.game.name,
+            stream=True,
+            output="-",
+            stdout=out,
+            stderr=err,
+        )
+
+        self.assertIn("Data exported successfully!", err.getvalue())
+        rows = list(csv.reader(StringIO(out.getvalue()), dialect=csv.unix_dialect))
+        expected = list(csv.reader(StringIO(file_content.format(game=self.game)), dialect=csv.unix_dialect))
+        self.assertEqual(rows[0], expected[0])
+        self.assertEqual(sorted(rows[1:]), sorted(expected[1:]))
+
+    def test_export_games_stream_gzip(self):
+        with TemporaryDirectory() as directory:
+            path = Path(directory) / "export.csv.gz"
+            call_command(
+                "export_games",
+                game_name=self.game.name,
+                stream=True,
+                output=str(path),
+                stdout=StringIO(),
+            )
+
+            with gzip.open(path, mode="rt") as f:
+                rows = list(csv.reader(f, dialect=csv.unix_dialect))
+
+        self.assertEqual(len(rows), 7)
+        self.assertEqual({row[0] for row in rows[1:]}, {self.game.name})
+
+    def test_import_games_bulk(self):
+        imported = SimpleNamespace(
+            name="imported",
+            description="Imported game",
+            status="draft",
+            level=2,
+            genre=SimpleNamespace(name="imported genre"),
+        )
+        with TemporaryDirectory() as directory:
+            path = Path(directory) / "import.csv"
+            path.write_text(file_content.format(game=imported))
+
+            for _ in range(2):
+                out = StringIO()
+                call_command("import_games", input=str(path), bulk=True, batch_size=4, stdout=out)
+                self.assertIn("6 rows imported", out.getvalue())
+                self.assertIn("rows/s", out.getvalue())
+
+        game = Game.objects.get(name="imported")
+        self.assertEqual(game.genre.name, "imported genre")
+        self.assertTrue(game.slug)
+        self.assertEqual(game.question_set.count(), 2)
+        self.assertEqual(
+            sorted(game.question_set.values_list("text", "answer_set__text")),
+            [(f"Question {q}", f"Answer {a}") for q in range(2) for a in range(3)],
+        )
+
     @classmethod
     def tearDownClass(cls):
         super().tearDownClass()
         if cls.path.exists():
             cls.path.unlink()
+
+    def test_dedupe_avatars(self):
+        players = GuestFactory.create_batch(2, user__first_name="John", user__last_name="Doe")
+        old_names = []
+        for player in players:
+            content = ContentFile(render_avatar(get_initials(player.user), "#123"))
+            old_names.append(default_storage.save("app/guest/avatar/legacy.png", content))
+            Player.objects.filter(pk=player.pk).update(avatar=old_names[-1])
+
+        call_command("dedupe_avatars", "--dry-run", stdout=StringIO())
+        self.assertTrue(all(default_storage.exists(name) for name in old_names))
+
+        out = StringIO()
+        call_command("dedupe_avatars", stdout=out)
+        self.assertIn("2 players moved to 1 shared avatars, 0 skipped.", out.getvalue())
+
+        names = set(Player.objects.filter(pk__in=[player.pk for player in players]).values_list("avatar", flat=True))
+        self.assertEqual(len(names), 1)
+        name = names.pop()
+        self.assertTrue(name.startswith("app/avatar/"))
+        self.assertTrue(default_storage.exists(name))
+        self.assertFalse(any(default_storage.exists(old_name) for old_name in old_names))
+        default_storage.delete(name)
+
+    def test_dedupe_avatars_renamed_player(self):
+        player = GuestFactory.create(user__first_name="John", user__last_name="Doe")
+        old_name = default_storage.save(
+            "app/guest/avatar/generated_avatar_AB.png", ContentFile(render_avatar("AB", "#123"))
+        )
+        Player.objects.filter(pk=player.pk).update(avatar=old_name)
+
+        call_command("dedupe_avatars", stdout=StringIO())
+
+        name = Player.objects.get(pk=player.pk).avatar.name
+        with default_storage.open(name, "rb") as file:
+            # The initials of the current name, not the ones of the old file
+            self.assertEqual(file.read(), render_avatar("JD", "#123"))
+        default_storage.delete(name)
+
+    def test_dedupe_avatars_keeps_uploaded_pictures(self):
+        player = GuestFactory.create(user__first_name="John", user__last_name="Doe")
+        picture = Image.new("RGB", (128, 128), color="#123")
+        picture.putpixel((64, 64), (255, 0, 0))
+        with BytesIO() as picture_io:
+            picture.save(picture_io, format="PNG")
+            content = picture_io.getvalue()
+        old_name = default_storage.save("app/guest/avatar/photo.png", ContentFile(content))
+        Player.objects.filter(pk=player.pk).update(avatar=old_name)
+
+        out = StringIO()
+        call_command("dedupe_avatars", stdout=out)
+
+        self.assertIn("1 skipped", out.getvalue())
+        self.assertEqual(Player.objects.get(pk=player.pk).avatar.name, old_name)
+        with default_storage.open(old_name, "rb") as file:
+            self.assertEqual(file.read(), content)
+        default_storage.delete(old_name)
+
+    def test_reconcile_game_counters(self):
+        Game.objects.filter(pk=self.game.pk).update(nb_questions=99, nb_players=5)
+
+        out = StringIO()
+        call_command("reconcile_game_counters", stdout=out)
+        self.assertIn(f"{self.game.name}: 99 questions instead of 2, 5 players instead of 0", out.getvalue())
+        self.assertEqual(Game.objects.get(pk=self.game.pk).nb_questions, 99)
+
+        out = StringIO()
+        call_command("reconcile_game_counters", "--fix", stdout=out)
+        self.assertIn("1 games fixed!", out.getvalue())
+        self.game.refresh_from_db()
+        self.assertEqual((self.game.nb_questions, self.game.nb_players), (2, 0))
+
+    def test_render_descriptions(self):
+        Game.objects.filter(pk=self.game.pk).update(description="**bold**", description_html="")
+
+        out = StringIO()
+        call_command("render_descriptions", stdout=out)
+        self.assertIn("1 descriptions rendered!", out.getvalue())
+        self.assertIn("<strong>bold</strong>", Game.objects.get(pk=self.game.pk).description_html)
+
+        out = StringIO()
+        call_command("render_descriptions", stdout=out)
+        self.assertIn("0 descriptions rendered!", out.getvalue())
+
+
+class ParallelImportTest(TransactionTestCase):
+    """The workers commit on their own connections: the imported rows must be visible outside of the test."""
+
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        self.path = self.write_csv("import.csv", [f"imported {index}" for index in range(4)])
+
+    def write_csv(self, filename, names):
+        path = Path(self.directory.name) / filename
+        games = [
+            SimpleNamespace(
+                name=name,
+                description="Imported game",
+                status="draft",
+                level=2,
+                genre=SimpleNamespace(name="imported genre"),
+            )
+            for name in names
+        ]
+        header, *_ = file_content.splitlines(keepends=True)
+        path.write_text(
+            header + "".join("".join(file_content.format(game=game).splitlines(keepends=True)[1:]) for game in games)
+        )
+        return path
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_shard_file(self):
+        with TemporaryDirectory() as directory:
+            paths, genre_names = shard_file(self.path, 2, directory)
+            shards = []
+            for path in paths:
+                with open_csv(path) as file:
+                    shards.append(list(read_rows(file)))
+
+        self.assertEqual(genre_names, {"imported genre"})
+        self.assertEqual(sum(len(rows) for rows in shards), 24)
+        # Every row of a game goes to the same shard
+        game_names = [{row["game__name"] for row in rows} for rows in shards]
+        self.assertFalse(game_names[0] & game_names[1])
+        self.assertEqual(game_names[0] | game_names[1], {f"imported {index}" for index in range(4)})
+
+    def test_import_games_workers(self):
+        for _ in range(2):
+            out = StringIO()
+            call_command("import_games", input=str(self.path), workers=2, batch_size=4, stdout=out)
+            self.assertIn("24 rows imported", out.getvalue())
+            self.assertIn("by 2 workers", out.getvalue())
+            self.assertIn("rows imported so far", out.getvalue())
+
+        # Imported twice, without duplicates
+        games = Game.objects.filter(name__startswith="imported ")
+        self.assertEqual(games.count(), 4)
+        self.assertEqual(len(set(games.values_list("slug", flat=True))), 4)
+        self.assertEqual(Question.objects.filter(game__in=games).count(), 8)
+        self.assertEqual(Answer.objects.filter(question__game__in=games).count(), 24)
+
+    def test_import_games_workers_colliding_slugs(self):
+        names = ["Quiz", "quiz!", "QUIZ?", "Quiz 2", "Other", "Another"]
+        path = self.write_csv("colliding.csv", names)
+
+        with TemporaryDirectory() as directory:
+            paths, _ = shard_file(path, 3, directory)
+            shards = []
+            for shard_path in paths:
+                with open_csv(shard_path) as file:
+                    shards.append({row["game__name"] for row in read_rows(file)})
+        # The games whose slugs can collide are imported by the same worker
+        self.assertEqual(sum(set(names[:4]) <= shard for shard in shards), 1)
+
+        out = StringIO()
+        call_command("import_games", input=str(path), workers=3, batch_size=4, stdout=out)
+        self.assertIn("36 rows imported", out.getvalue())
+
+        slugs = list(Game.objects.filter(name__in=names).values_list("slug", flat=True))
+        self.assertEqual(len(slugs), 6)
+        self.assertEqual(len(set(slugs)), 6)
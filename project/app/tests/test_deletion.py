@@ -0,0 +1,46 @@
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from ..deletion import request_deletion, delete_game
+from ..factories import GuestFactory
+from ..models import Answer, Entry, Game, Play, Player, Question
+from ..scoring import rescore_plays
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class GameDeletionTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.game = Game.objects.create(name="Deleted")
+        cls.kept_game = Game.objects.create(name="Kept")
+        cls.player = GuestFactory.create(score=10)
+        cls.play = Play.objects.create(player=cls.player, game=cls.game)
+        question = cls.game.question_set.order_by("pk").first()
+        answer = question.answer_set.order_by("pk").first()
+        Answer.objects.filter(pk=answer.pk).update(points=4)
+        Entry.objects.filter(play=cls.play, question=question).update(answer=answer)
+        rescore_plays([cls.play.pk])
+
+    @mock.patch("app.tasks.delete_game.delay")
+    def test_request_deletion_hides_the_game(self, delay_mock):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(request_deletion(Game.objects.filter(pk=self.game.pk)), 1)
+            # Already requested
+            self.assertEqual(request_deletion(Game.objects.filter(pk=self.game.pk)), 0)
+
+        delay_mock.assert_called_once_with(self.game.pk)
+        self.assertQuerySetEqual(Game.objects.visible(), [self.kept_game])
+        self.assertTrue(Game.objects.filter(pk=self.game.pk).exists())
+
+    def test_delete_game_by_batches(self):
+        delete_game(self.game.pk, batch_size=2)
+
+        self.assertFalse(Game.objects.filter(pk=self.game.pk).exists())
+        self.assertFalse(Question.objects.filter(game_id=self.game.pk).exists())
+        self.assertFalse(Answer.objects.filter(question__game_id=self.game.pk).exists())
+        self.assertFalse(Play.objects.filter(game_id=self.game.pk).exists())
+        self.assertEqual(Question.objects.filter(game=self.kept_game).count(), 2)
+        # The score of the deleted play is taken back from its player
+        self.assertEqual(Player.objects.get(pk=self.player.pk).score, 10)
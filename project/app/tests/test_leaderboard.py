@@ -0,0 +1,57 @@
+from django.test import TestCase, override_settings
+
+from .. import leaderboard
+from ..factories import PlayerFactory
+from ..models import Answer, Entry, Game, Play
+from ..scoring import rescore_plays
+
+
+# Without Redis, every answer comes from the database
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class LeaderboardFallbackTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        # Plain players: a guest would bring the player who invited them, with a random score
+        cls.players = [PlayerFactory.create(score=score) for score in (10, 50, 30, 40, 20)]
+
+    def test_top(self):
+        board = leaderboard.top(3)
+        self.assertEqual([entry["rank"] for entry in board], [1, 2, 3])
+        self.assertEqual([entry["score"] for entry in board], [50, 40, 30])
+        self.assertEqual(board[0]["player_id"], self.players[1].pk)
+        self.assertEqual(board[0]["username"], self.players[1].user.username)
+
+    def test_rank_and_around(self):
+        self.assertEqual(leaderboard.rank(self.players[2].pk), (3, 30))
+        around = leaderboard.around(self.players[2].pk, radius=1)
+        self.assertEqual([(entry["rank"], entry["score"]) for entry in around], [(2, 40), (3, 30), (4, 20)])
+        self.assertEqual([entry["score"] for entry in leaderboard.around(self.players[1].pk, radius=1)], [50, 40])
+
+    def test_game_board(self):
+        game = Game.objects.create(name="Ranked")
+        question = game.question_set.order_by("pk").first()
+        answer = question.answer_set.first()
+        Answer.objects.filter(pk=answer.pk).update(points=3)
+        best = Play.objects.create(player=self.players[0], game=game)
+        Play.objects.create(player=self.players[1], game=game)
+        Entry.objects.filter(play=best, question=question).update(answer=answer)
+        rescore_plays([best.pk])
+
+        board = leaderboard.top(10, game_id=game.pk)
+        self.assertEqual([(entry["player_id"], entry["score"]) for entry in board], [(self.players[0].pk, 3), (self.players[1].pk, 0)])
+        self.assertEqual(leaderboard.rank(self.players[1].pk, game_id=game.pk), (2, 0))
+        self.assertIsNone(leaderboard.rank(self.players[2].pk, game_id=game.pk))
+
+    def test_api(self):
+        response = self.client.get("/api-ninja/leaderboard", {"limit": 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([entry["score"] for entry in response.json()], [50, 40])
+
+        response = self.client.get(f"/api-ninja/leaderboard/{self.players[4].pk}", {"radius": 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["rank"], 4)
+        self.assertEqual([entry["score"] for entry in response.json()["around"]], [30, 20, 10])
+
+        response = self.client.get("/api-ninja/leaderboard/0")
+        self.assertEqual(response.status_code, 404)
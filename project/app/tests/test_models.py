@@ -8,8 +8,9 @@ from django.utils.timezone import now
 from unittest import mock
 from factory.django import mute_signals
 
-from ..models import GameMaster
-from ..factories import UserFactory, AdminFactory
+from ..enums import GameStatus
+from ..models import Answer, Game, GameMaster, Play, Question, SlugCounter
+from ..factories import UserFactory, AdminFactory, GuestFactory
 
 
 class GameMasterTest(TestCase):
@@ -88,3 +89,123 @@ class GameMasterTest(TestCase):
             raw=False,
             using="default",
         )
+
+
+class GameSlugTest(TestCase):
+
+    def test_generate_slug_numbers_duplicates(self):
+        self.assertEqual(Game.objects.create(name="Quiz").slug, "quiz")
+        self.assertEqual(Game.objects.create(name="QUIZ!").slug, "quiz-2")
+        self.assertEqual(Game.objects.create(name="Quiz?").slug, "quiz-3")
+        # Sharing a prefix does not make a duplicate
+        self.assertEqual(Game.objects.create(name="Quiz night").slug, "quiz-night")
+        self.assertEqual(SlugCounter.objects.get(base_slug="quiz").last_number, 3)
+
+    def test_generate_slug_skips_taken_slugs(self):
+        Game.objects.create(name="Quiz 2")
+        Game.objects.create(name="Quiz")
+        self.assertEqual(Game.objects.create(name="Quiz!").slug, "quiz-3")
+
+    def test_generate_slug_query_count_is_constant(self):
+        for index in range(20):
+            Game.objects.create(name=f"Quiz{'!' * index}")
+        with self.assertNumQueries(2):
+            self.assertEqual(Game.generate_slug("Quiz"), "quiz-21")
+
+
+class GameCountersTest(TestCase):
+
+    def test_nb_questions_follows_questions(self):
+        game = Game.objects.create(name="Counted")
+        other = Game.objects.create(name="Other")
+        game.refresh_from_db()
+        # The first two questions are created with bulk_create
+        self.assertEqual(game.nb_questions, 2)
+
+        Question.objects.bulk_create(Question(game=game, text=f"Bulk {index}", points=0) for index in range(5))
+        Question.objects.filter(game=game, text="Bulk 0").update(game=other)
+        Question.objects.filter(game=game, text="Bulk 1").delete()
+        game.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(game.nb_questions, 5)
+        self.assertEqual(other.nb_questions, 3)
+
+    def test_nb_players_follows_plays(self):
+        game = Game.objects.create(name="Counted")
+        play = Play.objects.create(player=GuestFactory.create(), game=game)
+        Play.objects.create(player=GuestFactory.create(), game=game)
+        game.refresh_from_db()
+        self.assertEqual(game.nb_players, 2)
+
+        play.delete()
+        game.refresh_from_db()
+        self.assertEqual(game.nb_players, 1)
+
+    def test_save_does_not_overwrite_counters(self):
+        game = Game.objects.create(name="Counted")
+        Question.objects.create(game=game, text="Late question", points=0)
+        game.name = "Renamed"
+        game.save()
+        game.refresh_from_db()
+        self.assertEqual(game.name, "Renamed")
+        self.assertEqual(game.nb_questions, 3)
+
+
+class GameDescriptionTest(TestCase):
+
+    def test_description_is_rendered_on_save(self):
+        game = Game.objects.create(name="Described", description="**bold**")
+        self.assertIn("<strong>bold</strong>", Game.objects.get(pk=game.pk).description_html)
+
+        game = Game.objects.get(pk=game.pk)
+        game.description = "*italic*"
+        game.save(update_fields=["description"])
+        self.assertIn("<em>italic</em>", Game.objects.get(pk=game.pk).description_html)
+
+    def test_unchanged_description_is_not_rendered_again(self):
+        Game.objects.create(name="Described", description="**bold**")
+        game = Game.objects.get(name="Described")
+        with mock.patch("app.models.markdownify") as markdownify_mock:
+            game.name = "Renamed"
+            game.save()
+            self.assertEqual(game.description_as_html, game.description_html)
+        markdownify_mock.assert_not_called()
+
+
+class GameCloneTest(TestCase):
+
+    def test_clone_copies_the_whole_tree(self):
+        game = Game.objects.create(name="Seasonal", description="**bold**", status=GameStatus.ONGOING)
+        Question.objects.bulk_create(Question(game=game, text=f"Extra {index}", points=index) for index in range(3))
+        Question.objects.filter(game=game, text="Extra 1").update(order=7)
+
+        clone = Game.objects.clone(game.pk)
+
+        self.assertEqual(clone.name, "Seasonal (copy)")
+        self.assertNotEqual(clone.slug, game.slug)
+        self.assertEqual(clone.status, GameStatus.DRAFT)
+        self.assertEqual(clone.description_html, Game.objects.get(pk=game.pk).description_html)
+        self.assertEqual(clone.nb_questions, 5)
+        self.assertEqual(
+            sorted(clone.question_set.values_list("text", "points", "order")),
+            sorted(game.question_set.values_list("text", "points", "order")),
+        )
+        self.assertEqual(
+            sorted(Answer.objects.filter(question__game=clone).values_list("question__text", "text", "points")),
+            sorted(Answer.objects.filter(question__game=game).values_list("question__text", "text", "points")),
+        )
+        self.assertEqual(Game.objects.clone(game.pk).name, "Seasonal (copy 2)")
+
+    def test_clone_retries_a_name_taken_meanwhile(self):
+        game = Game.objects.create(name="Seasonal")
+        Game.objects.create(name="Seasonal (copy)")
+
+        # As if the name was free when checked
+        with mock.patch.object(Game.objects, "copy_name", side_effect=["Seasonal (copy)", "Seasonal (copy 2)"]):
+            clone = Game.objects.clone(game.pk)
+
+        self.assertEqual(clone.name, "Seasonal (copy 2)")
+        self.assertEqual(clone.nb_questions, 2)
+
+        with self.assertRaises(IntegrityError):
+            Game.objects.clone(game.pk, name="Seasonal (copy)")
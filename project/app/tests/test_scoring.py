@@ -0,0 +1,82 @@
+from unittest import mock
+
+from django.test import TestCase
+
+from ..factories import GuestFactory
+from ..models import Answer, Entry, Game, Play, Player
+from ..scoring import rescore_plays, rescore_game, recompute_player_scores
+
+
+class ScoringTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.game = Game.objects.create(name="Scored")
+        cls.questions = list(cls.game.question_set.order_by("pk"))
+        cls.answers = [question.answer_set.order_by("pk").first() for question in cls.questions]
+        for points, answer in zip((3, 5), cls.answers):
+            Answer.objects.filter(pk=answer.pk).update(points=points)
+        cls.player = GuestFactory.create(score=100)
+        cls.play = Play.objects.create(player=cls.player, game=cls.game)
+
+    def answer(self, index):
+        Entry.objects.filter(play=self.play, question=self.questions[index]).update(answer=self.answers[index])
+
+    def test_rescore_plays_applies_differences(self):
+        self.answer(0)
+        with self.assertNumQueries(1):
+            self.assertEqual(rescore_plays([self.play.pk]), {self.player.pk: 103})
+
+        self.answer(1)
+        self.assertEqual(rescore_plays([self.play.pk]), {self.player.pk: 108})
+        self.play.refresh_from_db()
+        self.assertEqual(self.play.score, 8)
+
+        # Nothing changed: nothing is updated
+        self.assertEqual(rescore_plays([self.play.pk]), {})
+
+        Entry.objects.filter(play=self.play).update(answer=None)
+        self.assertEqual(rescore_plays([self.play.pk]), {self.player.pk: 100})
+
+    def test_rescore_game_by_chunks(self):
+        other_play = Play.objects.create(player=GuestFactory.create(score=0), game=self.game)
+        Entry.objects.filter(play__game=self.game, question=self.questions[1]).update(answer=self.answers[1])
+
+        self.assertEqual(rescore_game(self.game.pk, chunk_size=1), 2)
+        self.assertEqual(
+            set(Play.objects.filter(game=self.game).values_list("pk", "score")),
+            {(self.play.pk, 5), (other_play.pk, 5)},
+        )
+
+    def test_recompute_player_scores(self):
+        self.answer(0)
+        rescore_plays([self.play.pk])
+        recompute_player_scores()
+        self.assertEqual(Player.objects.get(pk=self.player.pk).score, 3)
+
+    def test_answer_points_change_rescores_plays(self):
+        self.answer(0)
+        rescore_plays([self.play.pk])
+
+        answer = Answer.objects.get(pk=self.answers[0].pk)
+        answer.points = 7
+        answer.save()
+        self.play.refresh_from_db()
+        self.assertEqual(self.play.score, 7)
+        self.assertEqual(Player.objects.get(pk=self.player.pk).score, 107)
+
+        # Saving again without change does not apply the difference twice
+        answer.save()
+        self.assertEqual(Player.objects.get(pk=self.player.pk).score, 107)
+
+    @mock.patch("app.scoring.RESCORE_INLINE_LIMIT", 0)
+    @mock.patch("app.tasks.rescore_answer_plays.delay")
+    def test_popular_answer_is_rescored_by_a_task(self, delay_mock):
+        self.answer(0)
+        answer = Answer.objects.get(pk=self.answers[0].pk)
+        answer.points = 7
+        with self.captureOnCommitCallbacks(execute=True):
+            answer.save()
+        delay_mock.assert_called_once_with(answer.pk)
+        self.play.refresh_from_db()
+        self.assertEqual(self.play.score, 0)
@@ -3,10 +3,18 @@ from datetime import timedelta
 from django.test import TestCase
 
 from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
 
 from ..enums import GameLevel, GameStatus
 from ..models import Game, Question, Answer, Genre
-from ..serializers import GameSerializer, QuestionSerializer, AnswerSerializer
+from ..serializers import (
+    GameSerializer,
+    QuestionSerializer,
+    AnswerSerializer,
+    game_rows,
+    serialize_game_rows,
+    render_json,
+)
 from ..factories import GameFactory
 
 
@@ -265,3 +273,25 @@ class SerializerTestCase(TestCase):
 
         serializer = GameSerializer(data=game_data)
         self.assertTrue(serializer.is_valid())
+
+
+class FastGameSerializationTest(TestCase):
+
+    def setUp(self):
+        genre = Genre.objects.create(name="Test")
+        GameFactory(name="Alpha", genre=genre, duration=timedelta(days=1, minutes=5), description="Déjà vu\u2028")
+        GameFactory(name="Beta", genre=None, duration=None)
+        # Distinct orders: with ties, the order of the rows is not defined
+        for index, question in enumerate(Question.objects.all()):
+            Question.objects.filter(pk=question.pk).update(order=index)
+            for answer_index, answer in enumerate(question.answer_set.all()):
+                Answer.objects.filter(pk=answer.pk).update(order=answer_index)
+
+    def test_same_output_as_game_serializer(self):
+        games = Game.objects.order_by("name", "pk")
+        expected = JSONRenderer().render(GameSerializer(games.full_tree(), many=True).data)
+
+        with self.assertNumQueries(3):
+            content = render_json(serialize_game_rows(list(game_rows(games))))
+
+        self.assertEqual(content, expected)
@@ -1,10 +1,11 @@
 from unittest import mock
 
+from django.db import DatabaseError, connection, transaction
 from django.test import TestCase
 
-from ..models import Player
-from ..signals import player_post_save_create_avatar
+from .. import events
 from ..factories import GuestFactory
+from ..models import Answer, Game, Question
 
 
 class PlayerTest(TestCase):
@@ -13,14 +14,114 @@ class PlayerTest(TestCase):
     def setUpTestData(cls):
         cls.player = GuestFactory.build(pk=1)
 
-    @mock.patch("app.signals.create_avatar.delay")
-    def test_player_post_save_create_avatar(self, create_avatar_mock):
-        player_post_save_create_avatar(
-            sender=Player,
-            instance=self.player,
-            created=True,
-            update_fields=None,
-            raw=False,
-            using="default",
+    @mock.patch("app.signals.queue_avatar")
+    def test_player_created_create_avatar(self, queue_avatar_mock):
+        with self.captureOnCommitCallbacks(execute=True):
+            events.emit("player.created", self.player)
+            queue_avatar_mock.assert_not_called()
+        queue_avatar_mock.assert_called_once_with(1)
+
+    @mock.patch("app.signals.queue_avatar")
+    def test_events_are_deduplicated_by_transaction(self, queue_avatar_mock):
+        with self.captureOnCommitCallbacks(execute=True):
+            events.emit("player.created", self.player)
+            events.emit("player.updated", self.player)
+            events.emit("player.updated", self.player)
+        # Once per handler and player, whatever the events
+        queue_avatar_mock.assert_called_once_with(1)
+
+    @mock.patch("app.signals.queue_avatar")
+    def test_events_of_a_rolled_back_savepoint_are_dropped(self, queue_avatar_mock):
+        other = GuestFactory.build(pk=2)
+        with self.captureOnCommitCallbacks(execute=True):
+            events.emit("player.created", self.player)
+            try:
+                with transaction.atomic():
+                    events.emit("player.created", other)
+                    raise DatabaseError
+            except DatabaseError:
+                pass
+        queue_avatar_mock.assert_called_once_with(1)
+
+    def test_on_commit_callbacks_layout(self):
+        # Fails loudly if a Django upgrade changes the private layout the events module relies on
+        first, second = mock.Mock(), mock.Mock()
+        with self.captureOnCommitCallbacks() as callbacks:
+            transaction.on_commit(first)
+            with transaction.atomic():
+                transaction.on_commit(second)
+                self.assertTrue(events._is_registered(connection, first))
+                events._run_last(connection, first)
+                self.assertEqual(
+                    [callback for _, callback, _ in events._commit_callbacks(connection)][-2:], [second, first]
+                )
+            try:
+                with transaction.atomic():
+                    transaction.on_commit(second)
+                    raise DatabaseError
+            except DatabaseError:
+                pass
+            self.assertTrue(events._is_registered(connection, first))
+        self.assertEqual(callbacks, [second, first])
+
+    @mock.patch("app.signals.leaderboard.update_player_scores")
+    def test_leaderboard_only_follows_the_score(self, update_mock):
+        with self.captureOnCommitCallbacks(execute=True):
+            player = GuestFactory.create()
+        update_mock.reset_mock()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            player.save(update_fields=["profile_activated"])
+        update_mock.assert_not_called()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            player.score = 42
+            player.save(update_fields=["score"])
+        update_mock.assert_called_once_with({player.pk: 42})
+
+    @mock.patch("app.signals.bump_model_versions")
+    def test_bulk_event_is_handled_once(self, bump_mock):
+        players = [GuestFactory.build(pk=pk) for pk in range(1, 11)]
+        with self.captureOnCommitCallbacks(execute=True):
+            events.emit_many("player.deleted", players)
+        bump_mock.assert_called_once()
+
+    @mock.patch("app.signals.queue_avatar")
+    def test_suppressed_events_are_not_dispatched(self, queue_avatar_mock):
+        with self.captureOnCommitCallbacks(execute=True):
+            with events.suppressed("player.created"):
+                events.emit("player.created", self.player)
+        queue_avatar_mock.assert_not_called()
+
+
+class AnswerDeletionTest(TestCase):
+
+    def setUp(self):
+        self.game = Game.objects.create(name="Deleted")
+        self.question = self.game.question_set.first()
+        # Without saving the answers: the deletions are tested independently of the save handlers
+        self.answers = list(self.question.answer_set.order_by("pk"))
+        for points, answer in zip((1, 3, 5), self.answers):
+            Answer.objects.filter(pk=answer.pk).update(points=points)
+        Question.objects.filter(pk=self.question.pk).update(points=5)
+
+    def test_deleting_the_best_answer_lowers_the_question_points(self):
+        self.question.refresh_from_db()
+        self.assertEqual(self.question.points, 5)
+
+        self.answers[2].delete()
+        self.question.refresh_from_db()
+        self.assertEqual(self.question.points, 3)
+
+        Answer.objects.filter(question=self.question).delete()
+        self.question.refresh_from_db()
+        self.assertEqual(self.question.points, 0)
+
+    def test_cascade_does_not_recompute_the_question_points(self):
+        Answer.objects.bulk_create(
+            Answer(question=self.question, text=f"Bulk {index}", points=0) for index in range(50)
         )
-        create_avatar_mock.assert_called_once_with(1)
+        with mock.patch.object(Question.objects, "filter", wraps=Question.objects.filter) as filter_mock:
+            self.question.delete()
+        filter_mock.assert_not_called()
+        self.assertFalse(Answer.objects.filter(question_id=self.question.pk).exists())
@@ -1,6 +1,12 @@
-from django.test import TestCase
+from unittest import mock
 
-from ..tasks import create_avatar
+from django.db.models.signals import post_save
+from django.test import TestCase, override_settings
+
+from ..models import Answer, Entry, Game, GameStatistics, Play, Player, Question
+from ..avatars import store_avatar
+from ..generation import get_progress
+from ..tasks import create_avatar, create_avatars_batch, generate_questions_answers, refresh_game_statistics
 from ..factories import GuestFactory
 
 
@@ -18,5 +24,103 @@ class PlayerTest(TestCase):
         create_avatar(self.player.pk)
 
         self.player.refresh_from_db()
-        self.assertIn("app/guest/avatar/", self.player.avatar.name)
-        self.assertIn("app/guest/avatar/", self.player.avatar.path)
+        self.assertRegex(self.player.avatar.name, r"^app/avatar/[0-9a-f]{2}/[0-9a-f]{64}\.png$")
+        self.assertIn("app/avatar/", self.player.avatar.path)
+
+    def test_create_avatars_batch(self):
+        players = GuestFactory.create_batch(3)
+        receiver_calls = []
+
+        def receiver(**kwargs):
+            receiver_calls.append(kwargs)
+
+        post_save.connect(receiver)
+        try:
+            self.assertEqual(create_avatars_batch([player.pk for player in players]), 3)
+        finally:
+            post_save.disconnect(receiver)
+
+        self.assertEqual(receiver_calls, [])
+        for player in Player.objects.filter(pk__in=[player.pk for player in players]):
+            self.assertTrue(player.avatar.name.startswith("app/avatar/"))
+
+        # Players already having an avatar are skipped
+        self.assertEqual(create_avatars_batch([player.pk for player in players]), 0)
+
+    def test_store_avatar_shares_identical_avatars(self):
+        name = store_avatar("JD", "#123")
+        self.assertEqual(store_avatar("JD", "#112233"), name)
+        self.assertNotEqual(store_avatar("JD", "#321"), name)
+        self.assertNotEqual(store_avatar("JD", "#123", size=64), name)
+        self.assertNotEqual(store_avatar("DJ", "#123"), name)
+
+
+class GameStatisticsTest(TestCase):
+
+    def test_refresh_game_statistics(self):
+        game = Game.objects.create(name="Measured")
+        idle_game = Game.objects.create(name="Idle")
+        play = Play.objects.create(player=GuestFactory.create(), game=game)
+        Play.objects.create(player=GuestFactory.create(), game=game)
+
+        question = game.question_set.order_by("pk").first()
+        answer = question.answer_set.first()
+        Answer.objects.filter(pk=answer.pk).update(points=4)
+        Entry.objects.filter(play=play, question=question).update(answer=answer)
+
+        refresh_game_statistics()
+
+        statistics = GameStatistics.objects.get(game=game)
+        self.assertEqual(statistics.nb_questions, 2)
+        self.assertEqual(statistics.nb_players, 2)
+        self.assertEqual(statistics.average_score, 2)
+        self.assertEqual(statistics.completion_rate, 0.25)
+        self.assertIsNotNone(statistics.last_played_at)
+
+        statistics = GameStatistics.objects.get(game=idle_game)
+        self.assertEqual((statistics.nb_players, statistics.average_score), (0, None))
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class GenerationTest(TestCase):
+
+    def test_generate_questions_answers(self):
+        game = Game.objects.create(name="Generated")
+        generate_questions_answers.apply(
+            kwargs={
+                "game_id": game.pk,
+                "num_questions": 5,
+                "question_prefix": "Q",
+                "num_answers_per_question": 3,
+                "answer_prefix": "A",
+            },
+            task_id="generation",
+        )
+
+        self.assertEqual(get_progress("generation"), {"state": "done", "done": 5, "total": 5})
+        self.assertEqual(Question.objects.filter(game=game, text__startswith="Q ").count(), 5)
+        self.assertEqual(Answer.objects.filter(question__game=game, text__startswith="A ").count(), 15)
+        # Worth at least as much as their best answer
+        self.assertEqual(Question.objects.get(game=game, text="Q 1").points, 3)
+        self.assertEqual(Question.objects.get(game=game, text="Q 5").points, 5)
+
+    def test_generate_questions_answers_twice(self):
+        game = Game.objects.create(name="Generated twice")
+        kwargs = {
+            "game_id": game.pk,
+            "num_questions": 3,
+            "question_prefix": "Q",
+            "num_answers_per_question": 2,
+            "answer_prefix": "A",
+        }
+        with mock.patch("app.generation.events.emit_many") as emit_mock:
+            generate_questions_answers.apply(kwargs=kwargs, task_id="first")
+        # The cached pages of the game are invalidated
+        self.assertEqual(emit_mock.call_args.args[0], "game.updated")
+        self.assertEqual([game.pk for game in emit_mock.call_args.args[1]], [game.pk])
+
+        # The same texts: refused before creating anything
+        kwargs["num_questions"] = 5
+        generate_questions_answers.apply(kwargs=kwargs, task_id="second")
+        self.assertEqual(get_progress("second"), {"state": "failed", "done": 0, "total": 5})
+        self.assertEqual(Question.objects.filter(game=game, text__startswith="Q ").count(), 3)
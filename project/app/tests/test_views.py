@@ -0,0 +1,146 @@
+import re
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from ..enums import GameStatus
+from ..factories import GameFactory, GuestFactory
+from ..models import Entry, Game, Genre, Play, Question
+
+
+class GameQueryShapeTest(TestCase):
+    """The number of queries of each listing must not depend on the number of games."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.genre = Genre.objects.create(name="shapes")
+
+    def create_games(self, nb_games):
+        for _ in range(nb_games):
+            GameFactory.create(name=f"shape {Game.objects.count()}", genre=self.genre, status=GameStatus.ONGOING)
+
+    def capture(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return context.captured_queries
+
+    def assertConstantQueries(self, url, expected=None):
+        self.create_games(1)
+        few = self.capture(url)
+        self.create_games(5)
+        many = self.capture(url)
+        self.assertEqual(len(few), len(many))
+        if expected is not None:
+            self.assertEqual(len(many), expected)
+        return many
+
+    def test_game_list_view(self):
+        queries = self.assertConstantQueries("/game/", expected=1)
+        self.assertNotIn("description", queries[0]["sql"])
+
+    def test_drf_game_list(self):
+        self.assertConstantQueries("/api-drf/games/", expected=3)
+
+    def test_ninja_game_list(self):
+        self.assertConstantQueries("/api-ninja/games/", expected=3)
+
+    def test_ninja_game_detail(self):
+        game = GameFactory.create(name="shape detail", genre=self.genre)
+        self.assertEqual(len(self.capture(f"/api-ninja/games/{game.pk}")), 3)
+
+
+class GamePaginationTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        genre = Genre.objects.create(name="pages")
+        cls.names = [f"game {i:02}" for i in range(7)]
+        for name in cls.names:
+            GameFactory.create(name=name, genre=genre, status=GameStatus.ONGOING)
+
+    def walk(self, url):
+        """Follow the next links of the Link headers and return the names of every game."""
+        names = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            names += [game["name"] for game in response.json()]
+            links = {rel: link for link, rel in re.findall(r'<([^>]+)>; rel="(\w+)"', response.get("Link", ""))}
+            url = links.get("next")
+        return names
+
+    def test_drf_pages(self):
+        self.assertEqual(self.walk("/api-drf/games/?limit=3"), self.names)
+
+    def test_ninja_pages(self):
+        self.assertEqual(self.walk("/api-ninja/games/?limit=3"), self.names)
+
+    def test_html_pages(self):
+        response = self.client.get("/game/?limit=3")
+        self.assertEqual([game.name for game in response.context["game_list"]], self.names[:3])
+        self.assertIsNone(response.context["page"].previous_cursor)
+
+        response = self.client.get(f"/game/?limit=3&cursor={response.context['page'].next_cursor}")
+        self.assertEqual([game.name for game in response.context["game_list"]], self.names[3:6])
+
+        response = self.client.get(f"/game/?limit=3&cursor={response.context['page'].previous_cursor}")
+        self.assertEqual([game.name for game in response.context["game_list"]], self.names[:3])
+
+    def test_html_links_keep_the_page_size(self):
+        response = self.client.get("/game/?limit=3")
+        self.assertEqual(response.context["first_page_query"], "limit=3")
+        self.assertNotIn("prev", response.context["page_links"])
+
+        response = self.client.get(response.context["page_links"]["next"])
+        self.assertEqual([game.name for game in response.context["game_list"]], self.names[3:6])
+        self.assertIn("limit=3", response.context["page_links"]["prev"])
+        self.assertIn("limit=3", response.context["page_links"]["next"])
+
+
+class PlayUpdateQueryShapeTest(TestCase):
+    """The number of queries of the play page must not depend on the number of questions."""
+
+    def create_play(self, nb_questions):
+        game = Game.objects.create(name=f"{nb_questions} questions")
+        for index in range(2, nb_questions):
+            Question.objects.create(game=game, text=f"Question {index}", points=0, order=index)
+        return Play.objects.create(player=GuestFactory.create(), game=game)
+
+    def post_data(self, play):
+        entries = list(Entry.objects.filter(play=play).order_by("question__order", "question_id"))
+        data = {
+            "entry_set-TOTAL_FORMS": len(entries),
+            "entry_set-INITIAL_FORMS": len(entries),
+            "entry_set-MIN_NUM_FORMS": 0,
+            "entry_set-MAX_NUM_FORMS": 1000,
+        }
+        for index, entry in enumerate(entries):
+            data[f"entry_set-{index}-id"] = entry.pk
+            data[f"entry_set-{index}-play"] = play.pk
+            data[f"entry_set-{index}-answer"] = entry.question.answer_set.first().pk
+        return data
+
+    def test_get(self):
+        counts = []
+        for nb_questions in (2, 12):
+            play = self.create_play(nb_questions)
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(f"/game/play/{play.pk}/")
+            self.assertEqual(response.status_code, 200)
+            self.assertContains(response, f"Question {nb_questions - 1}")
+            counts.append(len(context.captured_queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_post(self):
+        counts = []
+        for nb_questions in (2, 12):
+            play = self.create_play(nb_questions)
+            data = self.post_data(play)
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.post(f"/game/play/{play.pk}/", data)
+            self.assertEqual(response.status_code, 302)
+            self.assertFalse(Entry.objects.filter(play=play, answer__isnull=True).exists())
+            counts.append(len(context.captured_queries))
+        self.assertEqual(counts[0], counts[1])
@@ -8,6 +8,9 @@ from .views import (
     GameDeleteView,
     GenreDatatableView,
     bulk_create_questions_answers,
+    bulk_create_questions_answers_progress,
+    bulk_create_questions_answers_status,
+    clone_game,
     create_play,
     PlayUpdateView,
 )
@@ -22,6 +25,17 @@ urlpatterns = [
     path('create/', GameCreateView.as_view(), name="create"),
     path('genre/', GenreDatatableView.as_view(), name="genre"),
     path('<int:pk>/bulk-create-qr/', bulk_create_questions_answers, name='bulk_create_qr'),
+    path(
+        '<int:pk>/bulk-create-qr/<uuid:task_id>/',
+        bulk_create_questions_answers_progress,
+        name='bulk_create_qr_progress',
+    ),
+    path(
+        '<int:pk>/bulk-create-qr/<uuid:task_id>/status/',
+        bulk_create_questions_answers_status,
+        name='bulk_create_qr_status',
+    ),
+    path('<int:pk>/clone/', clone_game, name="clone"),
     path('<int:pk>/play/create/', create_play, name="create_play"),
     path('play/<int:pk>/', PlayUpdateView.as_view(), name="play"),
 ]
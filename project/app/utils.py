@@ -1,9 +1,11 @@
-import redis
+from itertools import batched
+
+from django_redis import get_redis_connection
 
 
 def get_all_redis_cache_keys():
-    # Connect to your Redis instance (use the same settings as your Django cache)
-    r = redis.StrictRedis.from_url('redis://tuto_django_redis:6379/1')  # Update with your actual Redis settings
+    # Connect to the Redis instance used by the default Django cache
+    r = get_redis_connection("default")
 
     # Use SCAN for better performance (vs KEYS, which can block)
     keys = r.scan_iter()  # Iterates over keys in the Redis instance
@@ -12,12 +14,12 @@ def get_all_redis_cache_keys():
 
 def delete_cache_by_prefix(prefix):
     # Connect to Redis directly (using the same settings as Django)
-    r = redis.StrictRedis.from_url('redis://tuto_django_redis:6379/1')
+    r = get_redis_connection("default")
 
     # Scan all keys with the specified prefix
-    keys = r.scan_iter(match=f"{prefix}*")  # Match keys starting with the prefix
+    keys = r.scan_iter(match=f"{prefix}*", count=1000)  # Match keys starting with the prefix
 
-    # Delete each key
-    for key in keys:
-        r.delete(key)
+    # Delete keys by batches, without blocking the server
+    for chunk in batched(keys, 1000):
+        r.unlink(*chunk)
     print(f"Deleted cache keys with prefix: {prefix}")
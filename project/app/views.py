@@ -1,4 +1,4 @@
-from itertools import product
+from uuid import uuid4
 
 from django.views.generic import (
     TemplateView,
@@ -8,32 +8,60 @@ from django.views.generic import (
     CreateView,
     DeleteView,
 )
-from django.db import transaction
+from django.db import IntegrityError, transaction
 from django.contrib import messages
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
-from django.http import HttpResponse, HttpResponseRedirect
+from django.http import HttpResponse, HttpResponseRedirect, JsonResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse_lazy, reverse
 from django.utils.decorators import method_decorator
+from django.views.decorators.http import require_POST
 from django.utils.translation import gettext_lazy as gettext
-from django.views.decorators.cache import cache_page
 
 from datatableview.views import DatatableView
-from rest_framework import viewsets
+from rest_framework import status, viewsets
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
 
 from project.ninja import api
 
+from . import generation, leaderboard
+from .caching import cache_page_depending_on, register_dependencies, aget_or_compute
+from .creation import create_games
+from .deletion import request_deletion
 from .models import Player, Game, Question, Answer, Genre, Play, Entry
+from .pagination import (
+    PAGE_SIZE,
+    KeysetPagination,
+    keyset_paginate,
+    akeyset_paginate,
+    get_page_size,
+    page_links,
+    link_header,
+)
 from .forms import GameForm, BulkQuestionAnswerGenerationForm, PlayForm, PlayFormSet, PlayFormSetHelper
-from .schemas import GameSchema, MessageSchema
-from .serializers import GameSerializer, QuestionSerializer, AnswerSerializer
+from .schemas import GameSchema, GameCreationResultSchema, MessageSchema, LeaderboardEntrySchema, PlayerRankSchema
+from .serializers import (
+    GameSerializer,
+    QuestionSerializer,
+    AnswerSerializer,
+    game_rows,
+    serialize_game_rows,
+    render_json,
+)
+from .scoring import rescore_plays
+from .statistics import get_home_statistics
+from .tasks import generate_questions_answers
 
 
 User = get_user_model()
 
 
-@method_decorator(cache_page(60 * 15, key_prefix="home_view"), name="dispatch")
+@method_decorator(
+    cache_page_depending_on(60 * 15, key_prefix="home_view", dependencies=(Player, Game)),
+    name="dispatch",
+)
 class HomeView(TemplateView):
     template_name = "home.html"
 
@@ -41,30 +69,52 @@ class HomeView(TemplateView):
         data = super().get_context_data(**kwargs)
         data |= {
             'page_title': gettext('Home'),
-            'nb_players': Player.objects.count(),
-            'best_players': Player.objects.order_by("-score")[:5],
-            'nb_games': Game.objects.count(),
+            **get_home_statistics(),
         }
         return data
 
 
 class GameListView(ListView):
-    queryset = Game.objects.playable
+    queryset = Game.objects.playable.summary()
+    # The page items are a list: the template cannot be deduced from them
+    template_name = "app/game_list.html"
+    context_object_name = "game_list"
+    page_size = PAGE_SIZE
+
+    def get_queryset(self):
+        self.page = keyset_paginate(
+            super().get_queryset(),
+            self.request.GET.get("cursor"),
+            get_page_size(self.request.GET.get("limit"), self.page_size),
+        )
+        return self.page.items
 
     def get_context_data(self, **kwargs):
         data = super().get_context_data(**kwargs)
         data['page_title'] = gettext("Games list")
+        data['page'] = self.page
+        # Keep the other query parameters, like the page size
+        data['page_links'] = page_links(self.request, self.page)
+        first_params = self.request.GET.copy()
+        first_params.pop("cursor", None)
+        data['first_page_query'] = first_params.urlencode()
         if self.request.user.is_authenticated:
-            data['plays'] = {play.game_id: play.pk for play in self.request.user.player.play.all()}
+            # Only the plays of the games displayed on this page
+            data['plays'] = dict(
+                Play.objects.filter(
+                    player__user=self.request.user,
+                    game_id__in=[game.pk for game in self.page],
+                ).values_list("game_id", "pk")
+            )
         return data
 
 
 class GameDetailView(DetailView):
-    model = Game
+    queryset = Game.objects.visible()
 
     def get_context_data(self, **kwargs):
         data = super().get_context_data(**kwargs)
-        obj = self.get_object()
+        obj = self.object
         data['page_title'] = str(gettext("Game: {}")).format(obj.name)
         if self.request.user.is_authenticated:
             try:
@@ -75,7 +125,7 @@ class GameDetailView(DetailView):
 
 
 class AlternativeGameUpdateView(UpdateView):
-    model = Game
+    queryset = Game.objects.visible()
     fields = (
         "name",
         "duration",
@@ -86,18 +136,18 @@ class AlternativeGameUpdateView(UpdateView):
 
     def get_context_data(self, **kwargs):
         data = super().get_context_data(**kwargs)
-        obj = self.get_object()
+        obj = self.object
         data['page_title'] = str(gettext("Update Game: {}")).format(obj.name)
         return data
 
 
 class GameUpdateView(UpdateView):
-    model = Game
+    queryset = Game.objects.visible()
     form_class = GameForm
 
     def get_context_data(self, **kwargs):
         data = super().get_context_data(**kwargs)
-        obj = self.get_object()
+        obj = self.object
         data['page_title'] = str(gettext("Update Game: {}")).format(obj.name)
         return data
 
@@ -125,20 +175,48 @@ class GameCreateView(CreateView):
 
 
 class GameDeleteView(DeleteView):
-    model = Game
+    queryset = Game.objects.visible()
     success_url = reverse_lazy('game:list')
 
     def get_context_data(self, **kwargs):
         data = super().get_context_data(**kwargs)
-        obj = self.get_object()
+        obj = self.object
         data['page_title'] = str(gettext("Delete Game: {}")).format(obj.name)
         return data
 
+    def form_valid(self, form):
+        # Hidden at once, deleted in the background
+        request_deletion(Game.objects.filter(pk=self.object.pk))
+        messages.add_message(
+            self.request,
+            messages.SUCCESS,
+            str(gettext("The game {} is being deleted.")).format(self.object.name),
+        )
+        return HttpResponseRedirect(self.get_success_url())
+
 
 class GameViewSet(viewsets.ModelViewSet):
-    queryset = Game.objects.all()
+    queryset = Game.objects.visible().full_tree()
+    pagination_class = KeysetPagination
     serializer_class = GameSerializer
 
+    def list(self, request, *args, **kwargs):
+        if not isinstance(request.accepted_renderer, JSONRenderer):
+            # The browsable API
+            return super().list(request, *args, **kwargs)
+
+        # Fast read path: three values() queries and no field-by-field serialization
+        rows = self.paginate_queryset(game_rows(Game.objects.visible()))
+        response = HttpResponse(render_json(serialize_game_rows(rows)), content_type="application/json")
+        if self.paginator.page.links:
+            response["Link"] = link_header(self.paginator.page.links)
+        return response
+
+    def destroy(self, request, *args, **kwargs):
+        # Hidden at once, deleted in the background
+        request_deletion(Game.objects.filter(pk=self.get_object().pk))
+        return Response(status=status.HTTP_202_ACCEPTED)
+
 
 class QuestionViewSet(viewsets.ModelViewSet):
     queryset = Question.objects.all()
@@ -151,19 +229,99 @@ class AnswerViewSet(viewsets.ModelViewSet):
 
 
 @api.get("/games/", response=list[GameSchema])
-def game_list(request):
-    queryset = Game.objects.all()
-    return list(queryset)
+def game_list(request, response: HttpResponse, cursor: str | None = None, limit: int = PAGE_SIZE):
+    page = keyset_paginate(Game.objects.visible().full_tree(), cursor, get_page_size(limit))
+    if links := page_links(request, page):
+        response["Link"] = link_header(links)
+    return page.items
 
 
 @api.get("/games/{game_id}", response={200: GameSchema, 404: MessageSchema})
 def game_detail(request, game_id: int):
     try:
-        return 200, Game.objects.get(pk=game_id)
+        return 200, Game.objects.visible().full_tree().get(pk=game_id)
     except Game.DoesNotExist as exc:
         return 404, MessageSchema(message="Not found")
 
 
+@api.post(
+    "/games/{game_id}/clone",
+    response={201: GameSchema, 404: MessageSchema, 409: MessageSchema, 422: MessageSchema},
+)
+def game_clone(request, game_id: int, name: str | None = None):
+    if not Game.objects.visible().filter(pk=game_id).exists():
+        return 404, MessageSchema(message="Not found")
+    if name is not None:
+        max_length = Game._meta.get_field("name").max_length
+        if not name or len(name) > max_length:
+            return 422, MessageSchema(message=f"The name must have between 1 and {max_length} characters")
+        if Game.objects.filter(name=name).exists():
+            return 409, MessageSchema(message="A game with this name already exists")
+    try:
+        clone = Game.objects.clone(game_id, name=name)
+    except IntegrityError:
+        # A game of the same name was created meanwhile
+        return 409, MessageSchema(message="A game with this name already exists")
+    return 201, Game.objects.full_tree().get(pk=clone.pk)
+
+
+# Async variants of the read endpoints, for ASGI deployments (see project/asgi.py)
+
+API_GAMES_KEY_PREFIX = "api_games"
+API_GAMES_TIMEOUT = 60
+register_dependencies(API_GAMES_KEY_PREFIX, Game, Question, Answer)
+
+
+@api.get("/async/games/", response=list[GameSchema])
+async def async_game_list(request, response: HttpResponse, cursor: str | None = None, limit: int = PAGE_SIZE):
+    page_size = get_page_size(limit)
+
+    async def get_page():
+        page = await akeyset_paginate(Game.objects.visible().full_tree(), cursor, page_size)
+        # Cached as plain data, the cursors being computed from the games
+        page.items = [GameSchema.from_orm(game).model_dump() for game in page.items]
+        return page
+
+    page = await aget_or_compute(API_GAMES_KEY_PREFIX, f"list:{page_size}:{cursor or ''}", get_page, API_GAMES_TIMEOUT)
+    if links := page_links(request, page):
+        response["Link"] = link_header(links)
+    return page.items
+
+
+@api.get("/async/games/{game_id}", response={200: GameSchema, 404: MessageSchema})
+async def async_game_detail(request, game_id: int):
+
+    async def get_game():
+        try:
+            game = await Game.objects.visible().full_tree().aget(pk=game_id)
+        except Game.DoesNotExist:
+            return None
+        return GameSchema.from_orm(game).model_dump()
+
+    game = await aget_or_compute(API_GAMES_KEY_PREFIX, f"detail:{game_id}", get_game, API_GAMES_TIMEOUT)
+    if game is None:
+        return 404, MessageSchema(message="Not found")
+    return 200, game
+
+
+@api.get("/leaderboard", response=list[LeaderboardEntrySchema])
+def leaderboard_top(request, game_id: int | None = None, limit: int = 10):
+    return leaderboard.top(get_page_size(limit, 10), game_id=game_id)
+
+
+@api.get("/leaderboard/{player_id}", response={200: PlayerRankSchema, 404: MessageSchema})
+def leaderboard_player(request, player_id: int, game_id: int | None = None, radius: int = 2):
+    player_rank = leaderboard.rank(player_id, game_id=game_id)
+    if player_rank is None:
+        return 404, MessageSchema(message="Not ranked")
+    rank, score = player_rank
+    return 200, PlayerRankSchema(
+        rank=rank,
+        score=score,
+        around=leaderboard.around(player_id, radius=max(0, min(radius, 10)), game_id=game_id),
+    )
+
+
 @api.post("/items", response={201: GameSchema, 422: MessageSchema, 500: MessageSchema})
 def game_create(request, game_data: GameSchema):
     try:
@@ -198,8 +356,15 @@ def game_create(request, game_data: GameSchema):
     return 201, game
 
 
+@api.post("/items/batch", response=list[GameCreationResultSchema])
+def game_create_batch(request, games_data: list[GameSchema]):
+    """Create many games at once, with a fixed number of queries, and return one result per game."""
+
+    return create_games([game_data.model_dump() for game_data in games_data])
+
+
 class GamePlayView(DetailView):
-    model = Game
+    queryset = Game.objects.visible()
     template_name = "admin/app/game/play.html"
 
     def get_context_data(self, **kwargs):
@@ -214,36 +379,27 @@ class GenreDatatableView(DatatableView):
 
 
 def bulk_create_questions_answers(request, pk):
-    if not Game.objects.filter(pk=pk).exists():
+    if not Game.objects.visible().filter(pk=pk).exists():
         messages.error(request, "The game you tried to get does not exist.")
         return redirect("game:list")
 
     if request.method == 'POST':
         form = BulkQuestionAnswerGenerationForm(request.POST)
-        if form.is_valid():
-            num_questions = form.cleaned_data['num_questions']
-            question_prefix = form.cleaned_data['question_prefix']
-            num_answers_per_question = form.cleaned_data['num_answers_per_question']
-            answer_prefix = form.cleaned_data['answer_prefix']
-
-            questions = Question.objects.bulk_create(
-                [
-                    Question(game_id=pk, text=f"{question_prefix} {i}", points=i)
-                    for i in range(1, num_questions + 1)
-                ]
-            )
-
-            answers = Answer.objects.bulk_create(
-                [
-                    Answer(question=question, text=f"{answer_prefix} {i}", points=i)
-                    for question, i in product(questions, range(1, num_answers_per_question + 1))
-                ]
+        if form.is_valid() and (
+            taken := generation.taken_question_texts(
+                pk, form.cleaned_data['num_questions'], form.cleaned_data['question_prefix']
             )
-            messages.success(
-                request,
-                f"{len(questions)} questions {len(answers)} and answer have been created.",
+        ):
+            form.add_error(
+                'question_prefix',
+                str(gettext("These questions already exist: {}")).format(", ".join(taken)),
             )
-            return redirect("game:detail", pk=pk)
+        if form.is_valid():
+            # Generated by a Celery task, whose progress is polled by the next page
+            task_id = str(uuid4())
+            generation.set_progress(task_id, generation.PENDING, total=form.cleaned_data['num_questions'])
+            generate_questions_answers.apply_async(kwargs={"game_id": pk, **form.cleaned_data}, task_id=task_id)
+            return redirect("game:bulk_create_qr_progress", pk=pk, task_id=task_id)
         else:
             messages.error(request, "Please fix the errors below.")
 
@@ -260,6 +416,30 @@ def bulk_create_questions_answers(request, pk):
     )
 
 
+def bulk_create_questions_answers_progress(request, pk, task_id):
+    return render(
+        request,
+        'app/generation_progress.html',
+        {
+            'page_title': gettext("Generation of questions and answers"),
+            'game': get_object_or_404(Game.objects.visible(), pk=pk),
+            'task_id': task_id,
+        },
+    )
+
+
+def bulk_create_questions_answers_status(request, pk, task_id):
+    return JsonResponse(generation.get_progress(task_id))
+
+
+@require_POST
+def clone_game(request, pk: int):
+    game = get_object_or_404(Game.objects.visible().only("pk"), pk=pk)
+    clone = Game.objects.clone(game.pk)
+    messages.add_message(request, messages.SUCCESS, str(gettext("The game {} has been created.")).format(clone.name))
+    return redirect("game:update", pk=clone.pk)
+
+
 def create_play(request, pk: int):
     try:
         player = request.user.player
@@ -270,6 +450,9 @@ def create_play(request, pk: int):
         messages.add_message(request, messages.ERROR, gettext("You do not have a player profile"))
         url = reverse_lazy("game:list")
     else:
+        if not Game.objects.visible().filter(pk=pk).exists():
+            messages.add_message(request, messages.ERROR, gettext("This game does not exist"))
+            return HttpResponseRedirect(reverse_lazy("game:list"))
         play = Play.objects.create(player=player, game_id=pk)
         # url = reverse_lazy("game:list")  # TEMPORAIRE
         url = reverse_lazy("game:play", kwargs={"pk": play.pk})
@@ -283,22 +466,28 @@ class PlayUpdateView(UpdateView):
     success_url = reverse_lazy("game:list")
 
     def get_object(self, queryset=None):
-        return get_object_or_404(Play, pk=self.kwargs['pk'])
+        return get_object_or_404(Play.objects.prefetch_related(None), pk=self.kwargs['pk'])
+
+    def get_entry_set(self):
+        # Built once per request: form_valid and the rendering share it
+        if not hasattr(self, "_entry_set"):
+            if self.request.method == "POST":
+                self._entry_set = PlayFormSet(self.request.POST, instance=self.object)
+            else:
+                self._entry_set = PlayFormSet(instance=self.object)
+        return self._entry_set
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        if self.request.method == "POST":
-            context["entry_set"] = PlayFormSet(self.request.POST, instance=self.object)
-        else:
-            context["entry_set"] = PlayFormSet(instance=self.object)
+        context["entry_set"] = self.get_entry_set()
         return context
 
     def form_valid(self, form):
-        context = self.get_context_data()
-        entry_set = context["entry_set"]
+        entry_set = self.get_entry_set()
         with transaction.atomic():
             if entry_set.is_valid():
                 entry_set.save()
+                rescore_plays([self.object.pk])
                 messages.add_message(self.request, messages.SUCCESS, gettext("Saved."))
             else:
                 messages.add_message(self.request, messages.WARNING, gettext("Please answer all questions."))
@@ -222,6 +222,22 @@ CELERY_TASK_SOFT_TIME_LIMIT = 30 * 60
 CELERY_ACKS_LATE = True
 BROKER_URL = CELERY_BROKER_URL
 
+CELERY_BEAT_SCHEDULE = {}
+
+# Precompute the home page statistics so that it never has to hit the database (in seconds, 0 to disable)
+if home_statistics_interval := int(os.environ.get("HOME_STATISTICS_INTERVAL", 60)):
+    CELERY_BEAT_SCHEDULE["home-statistics"] = {
+        "task": "app.tasks.stats",
+        "schedule": home_statistics_interval,
+    }
+
+# Refresh the materialized games statistics (in seconds, 0 to disable)
+if game_statistics_interval := int(os.environ.get("GAME_STATISTICS_INTERVAL", 300)):
+    CELERY_BEAT_SCHEDULE["game-statistics"] = {
+        "task": "app.tasks.refresh_game_statistics",
+        "schedule": game_statistics_interval,
+    }
+
 HEALTHCHECK_CACHE_KEY = "tuto_django_healthcheck_key"
 
 
@@ -365,6 +381,7 @@ JAZZMIN_SETTINGS = {
         "auth.user": "fas fa-user",
         "auth.Group": "fas fa-users",
         "app.StatGame": "fas fa-chart-simple",
+        "app.GameStatistics": "fas fa-chart-line",
         "app.Game": "fas fa-puzzle-piece",
         "app.GameMaster": "fa-regular fa-chess-king",
         "app.Subscriber": "fa-regular fa-chess-rook",